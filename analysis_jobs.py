@@ -0,0 +1,233 @@
+"""
+Analysis Jobs
+Runs analyses on a background executor so the app stays responsive, with
+progress reporting, cancellation and several jobs per user
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised from Job.report once cancellation has been requested"""
+
+
+class Job:
+    def __init__(self, kind: str, label: str):
+        """
+        Initialize a job
+
+        Args:
+            kind: "image", "video" or "website"
+            label: What is being analyzed, shown in the jobs list
+        """
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.label = label
+        self.status = QUEUED
+        self.message = "Waiting for a free worker"
+        self.fraction = 0.0
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        # Results completed so far, for analyses that stream; written through publish()
+        self.partial: Dict[str, Any] = {}
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self._cancel = threading.Event()
+        self._future: Optional[Future] = None
+        self._lock = threading.Lock()
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def report(self, message: str, fraction: Optional[float] = None):
+        """
+        Record progress; also the point where a cancelled job stops
+
+        Analyzer methods take this as their progress callback, so a
+        cancellation takes effect at the next step they report.
+
+        Raises:
+            JobCancelled: If cancel() was called for this job
+        """
+        if self._cancel.is_set():
+            raise JobCancelled(f"Job {self.id} cancelled")
+        with self._lock:
+            self.message = message
+            if fraction is not None:
+                self.fraction = max(0.0, min(1.0, fraction))
+
+    def publish(self, key: str, value: Any, category_id: Optional[str] = None):
+        """
+        Store a partial result while the job runs
+
+        Args:
+            key: Result key, e.g. "overall_score" or "categories"
+            value: Value to store
+            category_id: Store value under partial[key][category_id] instead
+        """
+        with self._lock:
+            if category_id is None:
+                self.partial[key] = value
+            else:
+                self.partial.setdefault(key, {})[category_id] = value
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Consistent copy of the job's state for display"""
+        with self._lock:
+            return {
+                "id": self.id,
+                "kind": self.kind,
+                "label": self.label,
+                "status": self.status,
+                "message": self.message,
+                "fraction": self.fraction,
+                "error": self.error,
+                # Nested dicts are copied too; the worker keeps adding categories
+                "partial": {key: dict(value) if isinstance(value, dict) else value
+                            for key, value in self.partial.items()},
+                "elapsed_seconds": round((self.finished or time.time()) - self.created, 1),
+            }
+
+
+class JobManager:
+    def __init__(self, max_workers: int = 4, max_finished: int = 200):
+        """
+        Initialize the job manager
+
+        Args:
+            max_workers: Analyses running at once across all users
+            max_finished: Finished jobs kept for their results before the oldest are dropped
+        """
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ux-job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, label: str, target: Callable[[Job], Dict[str, Any]]) -> str:
+        """
+        Queue an analysis
+
+        Args:
+            kind: "image", "video" or "website"
+            label: What is being analyzed
+            target: Runs the analysis; receives the Job to report progress on
+                and returns the analysis result
+
+        Returns:
+            Job id to poll with get()
+        """
+        job = Job(kind, label)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        job._future = self._executor.submit(self._run, job, target)
+        return job.id
+
+    def _run(self, job: Job, target: Callable[[Job], Dict[str, Any]]):
+        with job._lock:
+            if job.status == CANCELLED:
+                return
+            job.status = RUNNING
+            job.message = "Starting"
+        try:
+            result = target(job)
+        except JobCancelled:
+            result = None
+        except Exception as e:
+            result = {"error": f"Analysis failed: {str(e)}"}
+
+        with job._lock:
+            job.finished = time.time()
+            # Analyzer methods turn a JobCancelled into an error result; the flag is authoritative
+            if job._cancel.is_set():
+                job.status = CANCELLED
+                job.message = "Cancelled"
+            elif result and "error" not in result:
+                job.status = DONE
+                job.result = result
+                job.message = "Completed"
+                job.fraction = 1.0
+            else:
+                job.status = FAILED
+                job.result = result
+                job.error = (result or {}).get("error", "Analysis failed")
+                job.message = job.error
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self, job_ids: Iterable[str]) -> List[Job]:
+        """The jobs among job_ids that still exist, in the given order"""
+        with self._lock:
+            return [self._jobs[job_id] for job_id in job_ids if job_id in self._jobs]
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Request cancellation
+
+        A queued job never starts; a running one stops at its next progress
+        report. Model calls already in flight are allowed to finish.
+
+        Returns:
+            True if the job exists and had not finished
+        """
+        job = self.get(job_id)
+        if job is None or job.done:
+            return False
+        job._cancel.set()
+        if job._future is not None and job._future.cancel():
+            with job._lock:
+                job.status = CANCELLED
+                job.message = "Cancelled"
+                job.finished = time.time()
+        return True
+
+    def forget(self, job_id: str):
+        """Drop a job and its result, cancelling it first if it is still running"""
+        self.cancel(job_id)
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def _prune(self):
+        finished = sorted((job for job in self._jobs.values() if job.done), key=lambda job: job.finished or 0)
+        for job in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job.id]
+
+    def stats(self) -> Dict[str, int]:
+        """Job counts by status"""
+        counts = {status: 0 for status in (QUEUED, RUNNING) + FINISHED_STATUSES}
+        with self._lock:
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return counts
+
+
+_shared_manager: Optional[JobManager] = None
+_shared_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """Process-wide job manager, sized by UX_ANALYZER_JOB_WORKERS"""
+    global _shared_manager
+    with _shared_manager_lock:
+        if _shared_manager is None:
+            _shared_manager = JobManager(max_workers=int(os.getenv("UX_ANALYZER_JOB_WORKERS", "4")))
+        return _shared_manager
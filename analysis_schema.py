@@ -0,0 +1,130 @@
+"""
+Analysis Output Schema
+Builds the JSON schema the model's answer is constrained to, generated from
+the heuristics, and validates parsed results per category
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+
+STATUSES = ("PASS", "FAIL", "NEEDS_ATTENTION")
+STATUS_CODES = ("P", "F", "N")
+
+
+def _string_array() -> Dict[str, Any]:
+    return {"type": "array", "items": {"type": "string"}}
+
+
+def _strict_object(properties: Dict[str, Any]) -> Dict[str, Any]:
+    """Object schema in the form strict structured outputs require: every key listed, nothing extra"""
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+
+def build_response_schema(heuristics: Dict[str, Any], category_ids: Optional[Iterable[str]] = None,
+                          terse: bool = False) -> Dict[str, Any]:
+    """
+    JSON schema for an analysis of the given categories
+
+    Every category and checkpoint id is spelled out, so a schema-constrained
+    response cannot skip or invent checkpoints.
+
+    Args:
+        heuristics: Parsed ux_heuristics_structured.json
+        category_ids: Categories to include (defaults to all)
+        terse: Use the short keys of the compact and ids prompt profiles
+
+    Returns:
+        Schema for response_format={"type": "json_schema", ...}
+    """
+    category_ids = list(category_ids or heuristics)
+    categories = {}
+    for category_id in category_ids:
+        checkpoints = {}
+        for checkpoint in heuristics[category_id]["checkpoints"]:
+            if terse:
+                checkpoints[checkpoint["id"]] = _strict_object({
+                    "v": {"type": "string", "enum": list(STATUS_CODES)},
+                    "c": {"type": "integer"},
+                    "r": {"type": "string"},
+                    "a": {"type": "string"},
+                })
+            else:
+                checkpoints[checkpoint["id"]] = _strict_object({
+                    "status": {"type": "string", "enum": list(STATUSES)},
+                    "confidence": {"type": "integer"},
+                    "reasoning": {"type": "string"},
+                    "recommendation": {"type": "string"},
+                })
+        if terse:
+            categories[category_id] = _strict_object({
+                "s": {"type": "integer"},
+                "k": _strict_object(checkpoints),
+            })
+        else:
+            categories[category_id] = _strict_object({
+                "title": {"type": "string"},
+                "score": {"type": "integer"},
+                "checkpoints": _strict_object(checkpoints),
+            })
+
+    if terse:
+        return _strict_object({
+            "s": {"type": "integer"},
+            "sum": {"type": "string"},
+            "c": _strict_object(categories),
+            "pi": _string_array(),
+            "st": _string_array(),
+        })
+    return _strict_object({
+        "overall_score": {"type": "integer"},
+        "summary": {"type": "string"},
+        "categories": _strict_object(categories),
+        "priority_issues": _string_array(),
+        "strengths": _string_array(),
+    })
+
+
+def _valid_score(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and 0 <= value <= 100
+
+
+def invalid_categories(result: Dict[str, Any], heuristics: Dict[str, Any],
+                       category_ids: Optional[Iterable[str]] = None) -> List[str]:
+    """
+    Find the categories of a full-shape result that are missing or malformed
+
+    A category is valid when it has a 0-100 score and every checkpoint has a
+    known status, a 1-5 confidence and string reasoning/recommendation. Only
+    the listed ids are checked, so a result can be validated shard by shard.
+
+    Returns:
+        Ids of categories that need to be requested again, in heuristics order
+    """
+    categories = result.get("categories")
+    if not isinstance(categories, dict):
+        return list(category_ids or heuristics)
+
+    invalid = []
+    for category_id in (category_ids or heuristics):
+        category = categories.get(category_id)
+        if not isinstance(category, dict) or not _valid_score(category.get("score")):
+            invalid.append(category_id)
+            continue
+        checkpoints = category.get("checkpoints")
+        if not isinstance(checkpoints, dict):
+            invalid.append(category_id)
+            continue
+        for checkpoint in heuristics[category_id]["checkpoints"]:
+            verdict = checkpoints.get(checkpoint["id"])
+            if (not isinstance(verdict, dict)
+                    or verdict.get("status") not in STATUSES
+                    or verdict.get("confidence") not in (1, 2, 3, 4, 5)
+                    or not isinstance(verdict.get("reasoning", ""), str)
+                    or not isinstance(verdict.get("recommendation", ""), str)):
+                invalid.append(category_id)
+                break
+    return invalid
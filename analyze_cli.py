@@ -0,0 +1,257 @@
+"""
+Bulk Analysis CLI
+Walks a directory of exported screenshots and screen recordings, analyzes them
+concurrently and streams one JSONL result per file
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+from batch_crawl import load_completed
+from result_cache import DEFAULT_CACHE_DIR
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".gif")
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".webm", ".mkv")
+
+# One analyzer per worker process, built by _init_worker
+_worker_analyzer = None
+
+
+def find_media(root: str) -> List[Tuple[str, str]]:
+    """
+    Walk root for images and videos
+
+    Returns:
+        Sorted (path, kind) tuples, kind being "image" or "video"
+    """
+    media = []
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            extension = os.path.splitext(filename)[1].lower()
+            if extension in IMAGE_EXTENSIONS:
+                media.append((os.path.join(directory, filename), "image"))
+            elif extension in VIDEO_EXTENSIONS:
+                media.append((os.path.join(directory, filename), "video"))
+    return sorted(media)
+
+
+def analyze_file(analyzer, path: str, kind: str, num_frames: int = 5,
+                 frame_selection: str = "uniform") -> Dict[str, Any]:
+    """Analyze one file and wrap the result in a JSONL record"""
+    start = time.perf_counter()
+    if kind == "video":
+        # Files are already fanned out, so frames of one video go out as a single batched request
+        result = analyzer.analyze_video(path, num_frames=num_frames, batched=True, frame_selection=frame_selection)
+    else:
+        result = analyzer.analyze_image(path)
+    return {"path": path, "kind": kind, **result, "latency_seconds": round(time.perf_counter() - start, 3)}
+
+
+def _init_worker(cache_dir: Optional[str]):
+    global _worker_analyzer
+    from request_scheduler import BATCH
+    from ux_analyzer import UXAnalyzer
+    _worker_analyzer = UXAnalyzer(cache_dir=cache_dir, priority=BATCH)
+
+
+def _analyze_in_worker(path: str, kind: str, num_frames: int, frame_selection: str) -> Dict[str, Any]:
+    return analyze_file(_worker_analyzer, path, kind, num_frames, frame_selection)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def run(root: str, output_path: str, max_concurrency: int = 4, use_processes: bool = False,
+        resume: bool = False, cache_dir: Optional[str] = DEFAULT_CACHE_DIR, num_frames: int = 5,
+        frame_selection: str = "uniform") -> Dict[str, Any]:
+    """
+    Analyze every image and video under root, streaming results to output_path
+
+    Threads suit the default workload, which mostly waits on the API; processes
+    help when many videos make frame decoding the bottleneck.
+
+    Returns:
+        Run statistics: counts, wall time, throughput and latency percentiles
+    """
+    media = find_media(root)
+    completed = load_completed(output_path, key="path") if resume else {}
+    pending = [(path, kind) for path, kind in media if path not in completed]
+    print(f"{len(media)} files found, {len(completed)} already done, {len(pending)} to analyze", file=sys.stderr)
+
+    executor: Executor
+    analyzer = None
+    if use_processes:
+        import multiprocessing
+        executor = ProcessPoolExecutor(max_workers=max_concurrency, mp_context=multiprocessing.get_context("spawn"),
+                                       initializer=_init_worker, initargs=(cache_dir,))
+    else:
+        from request_scheduler import BATCH
+        from ux_analyzer import UXAnalyzer
+        analyzer = UXAnalyzer(cache_dir=cache_dir, priority=BATCH)
+        executor = ThreadPoolExecutor(max_workers=max_concurrency)
+
+    latencies: List[float] = []
+    failed = 0
+    start = time.perf_counter()
+    with executor, open(output_path, "a" if resume else "w", encoding="utf-8") as output:
+        if use_processes:
+            futures = {executor.submit(_analyze_in_worker, path, kind, num_frames, frame_selection): path
+                       for path, kind in pending}
+        else:
+            futures = {executor.submit(analyze_file, analyzer, path, kind, num_frames, frame_selection): path
+                       for path, kind in pending}
+
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                record = future.result()
+            except Exception as e:
+                record = {"path": futures[future], "error": f"Analysis failed: {str(e)}"}
+            # Stream each result as soon as it is ready
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+            if "error" in record:
+                failed += 1
+            else:
+                latencies.append(record["latency_seconds"])
+            print(f"[{done}/{len(pending)}] {record['path']}: {record.get('error') or record.get('overall_score')}",
+                  file=sys.stderr)
+    elapsed = time.perf_counter() - start
+
+    stats = {
+        "files": len(pending),
+        "skipped": len(completed),
+        "succeeded": len(latencies),
+        "failed": failed,
+        "wall_seconds": round(elapsed, 2),
+        "files_per_second": round(len(pending) / elapsed, 2) if elapsed > 0 else 0,
+        "latency_p50": percentile(latencies, 0.50),
+        "latency_p90": percentile(latencies, 0.90),
+        "latency_p99": percentile(latencies, 0.99),
+    }
+    if analyzer is not None:
+        stats["analyzer_metrics"] = dict(analyzer.metrics)
+        stats["scheduler"] = analyzer.scheduler.stats()
+    return stats
+
+
+def test_analyze_cli():
+    """Run the CLI over images and a video against a stub model endpoint, with threads and with --processes"""
+    import shutil
+    import subprocess
+    import tempfile
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    import numpy as np
+    import cv2 # type: ignore
+    from PIL import Image
+
+    def analysis(request: Dict[str, Any]) -> str:
+        response_format = request.get("response_format", {})
+        if response_format.get("type") == "json_object":
+            # Batched video frames
+            return json.dumps({"frames": [{"overall_score": 60, "summary": "stub", "category_scores": {},
+                                           "checkpoints": {}}], "combined": None})
+        schema = response_format["json_schema"]["schema"]["properties"]["categories"]["properties"]
+        categories = {category_id: {"title": category_id, "score": 80, "checkpoints": {
+            checkpoint_id: {"status": "PASS", "confidence": 4, "reasoning": "stub", "recommendation": ""}
+            for checkpoint_id in category["properties"]["checkpoints"]["properties"]}}
+            for category_id, category in schema.items()}
+        return json.dumps({"overall_score": 80, "summary": "stub", "categories": categories,
+                           "priority_issues": [], "strengths": []})
+
+    class ModelHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            body = json.dumps({
+                "id": "stub", "object": "chat.completion", "created": 0, "model": "stub",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": analysis(request)}}],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 10, "total_tokens": 20},
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ModelHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    work_dir = tempfile.mkdtemp(prefix="ux_analyze_cli_")
+    media_dir = os.path.join(work_dir, "media")
+    os.makedirs(media_dir)
+    try:
+        for index in range(3):
+            Image.new("RGB", (640, 400), (40 * index, 120, 200)).save(os.path.join(media_dir, f"screen{index}.png"))
+        writer = cv2.VideoWriter(os.path.join(media_dir, "session.mp4"), cv2.VideoWriter_fourcc(*"mp4v"),
+                                 10, (320, 240))
+        for frame_index in range(50):
+            writer.write(np.full((240, 320, 3), (frame_index * 5) % 255, np.uint8))
+        writer.release()
+
+        env = {**os.environ, "OPENAI_BASE_URL": f"http://127.0.0.1:{server.server_address[1]}/v1",
+               "OPENAI_API_KEY": "sk-analyze-cli-test"}
+        script = os.path.abspath(__file__)
+        for mode in ([], ["--processes"]):
+            output_path = os.path.join(work_dir, f"results{''.join(mode)}.jsonl")
+            start = time.perf_counter()
+            # A subprocess with a timeout, so a worker pool that never shuts down fails the test instead of hanging it
+            completed = subprocess.run(
+                [sys.executable, script, media_dir, "--output", output_path, "--cache-dir", "",
+                 "--num-frames", "3", *mode],
+                env=env, cwd=os.path.dirname(script), capture_output=True, text=True, timeout=120,
+            )
+            assert completed.returncode == 0, completed.stderr[-2000:]
+            with open(output_path, "r", encoding="utf-8") as f:
+                records = [json.loads(line) for line in f]
+            assert len(records) == 4, records
+            assert all("error" not in record for record in records), [r.get("error") for r in records]
+            assert sorted(record["kind"] for record in records) == ["image", "image", "image", "video"]
+            print(f"{'processes' if mode else 'threads':<10} {len(records)} files in "
+                  f"{time.perf_counter() - start:.1f} s, exited cleanly")
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze a directory of screenshots and recordings")
+    parser.add_argument("directory", help="Directory to walk for images and videos")
+    parser.add_argument("--output", default="ux_results.jsonl", help="JSONL file to stream results to")
+    parser.add_argument("--max-concurrency", type=int, default=4, help="Files analyzed at once")
+    parser.add_argument("--processes", action="store_true", help="Use worker processes instead of threads")
+    parser.add_argument("--resume", action="store_true", help="Skip files with a successful result in --output")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Result cache directory ('' to disable)")
+    parser.add_argument("--num-frames", type=int, default=5, help="Key frames analyzed per video")
+    parser.add_argument("--frame-selection", choices=["uniform", "scene"], default="uniform")
+    args = parser.parse_args()
+
+    stats = run(args.directory, args.output, max_concurrency=args.max_concurrency, use_processes=args.processes,
+                resume=args.resume, cache_dir=args.cache_dir or None, num_frames=args.num_frames,
+                frame_selection=args.frame_selection)
+
+    print(f"\nAnalyzed {stats['succeeded']} files ({stats['failed']} failed, {stats['skipped']} skipped) "
+          f"in {stats['wall_seconds']} s: {stats['files_per_second']} files/s", file=sys.stderr)
+    print(f"Latency p50 {stats['latency_p50']:.2f} s, p90 {stats['latency_p90']:.2f} s, "
+          f"p99 {stats['latency_p99']:.2f} s", file=sys.stderr)
+    if "analyzer_metrics" in stats:
+        print(f"Analyzer: {stats['analyzer_metrics']}", file=sys.stderr)
+        print(f"Scheduler: {stats['scheduler']}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    if "--test" in sys.argv:
+        test_analyze_cli()
+    else:
+        main()
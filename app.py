@@ -10,8 +10,8 @@ import tempfile
 from typing import Dict, Any
 import time
 from PIL import Image # Add missing import
-from ux_analyzer import UXAnalyzer
-from website_capture import WebsiteCapture
+from ux_analyzer import UXAnalyzer, PROMPT_PROFILES
+from analysis_jobs import Job, get_job_manager
 
 # Page configuration
 st.set_page_config(
@@ -93,14 +93,25 @@ def get_api_key() -> str:
     # 3. Return session state key (may be empty)
     return st.session_state.get("openai_api_key", "")
 
+@st.cache_resource(show_spinner=False)
+def get_shared_analyzer(prompt_profile: str = "full") -> UXAnalyzer:
+    """One analyzer per prompt profile for the whole server process
+
+    Sessions share its OpenAI client and connection pool, heuristics,
+    prompt cache and result cache instead of building their own.
+    """
+    return UXAnalyzer(prompt_profile=prompt_profile)
+
 def initialize_session_state():
     """Initialize session state variables"""
     if 'analysis_result' not in st.session_state:
         st.session_state.analysis_result = None
     if 'analyzer' not in st.session_state:
-        st.session_state.analyzer = UXAnalyzer()
-    if 'analyzing' not in st.session_state:
-        st.session_state.analyzing = False
+        st.session_state.analyzer = get_shared_analyzer()
+    if 'job_ids' not in st.session_state:
+        st.session_state.job_ids = []
+    if 'shown_job_ids' not in st.session_state:
+        st.session_state.shown_job_ids = set()
     if 'openai_api_key' not in st.session_state:
         st.session_state.openai_api_key = get_api_key()
 
@@ -149,50 +160,54 @@ def display_category_breakdown(result: Dict[str, Any]):
     st.subheader("📊 Category Breakdown")
     
     for category_id, category_data in categories.items():
-        title = category_data.get('title', f'Category {category_id}')
-        score = category_data.get('score', 0)
-        checkpoints = category_data.get('checkpoints', {})
-        
-        # Category header with score
-        col1, col2 = st.columns([3, 1])
-        with col1:
-            st.markdown(f"**{category_id}. {title}**")
-        with col2:
-            score_class = get_score_class(score)
-            st.markdown(f'<span class="{score_class}">**{score}%**</span>', unsafe_allow_html=True)
-        
-        # Progress bar
-        st.progress(score / 100)
-        
-        # Checkpoints details in expander
-        with st.expander(f"View {len(checkpoints)} checkpoints"):
-            for checkpoint_id, checkpoint_data in checkpoints.items():
-                status = checkpoint_data.get('status', 'UNKNOWN')
-                text = checkpoint_data.get('text', '')
-                reasoning = checkpoint_data.get('reasoning', '')
-                recommendation = checkpoint_data.get('recommendation', '')
-                
-                # Status icon and color
-                if status == 'PASS':
-                    icon = "✅"
-                    css_class = "checkpoint-pass"
-                elif status == 'FAIL':
-                    icon = "❌"
-                    css_class = "checkpoint-fail"
-                else:
-                    icon = "⚠️"
-                    css_class = "checkpoint-attention"
-                
-                st.markdown(f'{icon} **{checkpoint_id}**: {text}')
-                if reasoning:
-                    st.markdown(f'<small class="{css_class}">💭 {reasoning}</small>', unsafe_allow_html=True)
-                if recommendation:
-                    st.markdown(f"""
-                    <div class="recommendation-box">
-                        <strong>💡 Recommendation:</strong> {recommendation}
-                    </div>
-                    """, unsafe_allow_html=True)
-                st.markdown("---")
+        display_category(category_id, category_data)
+
+def display_category(category_id: str, category_data: Dict[str, Any]):
+    """Display one category with its score and checkpoints"""
+    title = category_data.get('title', f'Category {category_id}')
+    score = category_data.get('score', 0)
+    checkpoints = category_data.get('checkpoints', {})
+    
+    # Category header with score
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        st.markdown(f"**{category_id}. {title}**")
+    with col2:
+        score_class = get_score_class(score)
+        st.markdown(f'<span class="{score_class}">**{score}%**</span>', unsafe_allow_html=True)
+    
+    # Progress bar
+    st.progress(score / 100)
+    
+    # Checkpoints details in expander
+    with st.expander(f"View {len(checkpoints)} checkpoints"):
+        for checkpoint_id, checkpoint_data in checkpoints.items():
+            status = checkpoint_data.get('status', 'UNKNOWN')
+            text = checkpoint_data.get('text', '')
+            reasoning = checkpoint_data.get('reasoning', '')
+            recommendation = checkpoint_data.get('recommendation', '')
+            
+            # Status icon and color
+            if status == 'PASS':
+                icon = "✅"
+                css_class = "checkpoint-pass"
+            elif status == 'FAIL':
+                icon = "❌"
+                css_class = "checkpoint-fail"
+            else:
+                icon = "⚠️"
+                css_class = "checkpoint-attention"
+            
+            st.markdown(f'{icon} **{checkpoint_id}**: {text}')
+            if reasoning:
+                st.markdown(f'<small class="{css_class}">💭 {reasoning}</small>', unsafe_allow_html=True)
+            if recommendation:
+                st.markdown(f"""
+                <div class="recommendation-box">
+                    <strong>💡 Recommendation:</strong> {recommendation}
+                </div>
+                """, unsafe_allow_html=True)
+            st.markdown("---")
 
 def display_priority_issues(result: Dict[str, Any]):
     """Display priority issues and strengths"""
@@ -223,14 +238,17 @@ def check_api_key():
         return False
     return True
 
+def submit_analysis(kind: str, label: str, target):
+    """Queue an analysis as a background job owned by this session"""
+    job_id = get_job_manager().submit(kind, label, target)
+    st.session_state.job_ids.append(job_id)
+    st.toast(f"Started analysis of {label}")
+
 def analyze_image_upload():
     """Handle image upload and analysis"""
     if not check_api_key():
         return
         
-    if 'analyzing' not in st.session_state:
-        st.session_state.analyzing = False
-        
     st.subheader("📷 Upload Image")
     uploaded_file = st.file_uploader(
         "Choose an image file",
@@ -238,35 +256,54 @@ def analyze_image_upload():
         help="Upload a screenshot or image of your interface"
     )
     
-    if uploaded_file is not None and not st.session_state.analyzing:
+    if uploaded_file is not None:
         # Display uploaded image
         st.image(uploaded_file, caption="Uploaded Image", use_container_width=True)
         
+        stream = st.checkbox(
+            "Show results as they arrive",
+            value=True,
+            help="Render each category as soon as the model has evaluated it"
+        )
+        
         if st.button("Analyze Image", type="primary"):
-            st.session_state.analyzing = True
-            with st.spinner("Analyzing image against UX heuristics..."):
-                # Save uploaded file temporarily
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    tmp_path = tmp_file.name
-                
-                try:
-                    # Analyze the image
-                    result = st.session_state.analyzer.analyze_image(tmp_path)
-                    st.session_state.analysis_result = result
-                    
-                    # Clean up temporary file
-                    os.unlink(tmp_path)
-                    
-                    st.session_state.analyzing = False
-                    st.success("Analysis completed!")
-                    st.rerun()
-                    
-                except Exception as e:
-                    st.session_state.analyzing = False
-                    st.error(f"Analysis failed: {str(e)}")
-                    if os.path.exists(tmp_path):
-                        os.unlink(tmp_path)
+            # Jobs run outside the script run, so they get the analyzer and bytes, not session state
+            analyzer = st.session_state.analyzer
+            image_bytes = uploaded_file.getvalue()
+            if stream:
+                submit_analysis("image", uploaded_file.name,
+                                lambda job: stream_image_analysis(analyzer, image_bytes, job))
+            else:
+                submit_analysis("image", uploaded_file.name,
+                                lambda job: analyzer.analyze_image(image_bytes, progress=job.report))
+
+def stream_image_analysis(analyzer: UXAnalyzer, image_bytes: bytes, job: Job) -> Dict[str, Any]:
+    """Stream an image analysis into the job, publishing each category as soon as it is complete"""
+    total_checkpoints = sum(len(category['checkpoints']) for category in analyzer.heuristics.values())
+    evaluated = 0
+    result: Dict[str, Any] = {}
+    
+    job.report("Waiting for the model", 0.05)
+    for event, value in analyzer.analyze_image_stream(image_bytes):
+        if event == "overall_score":
+            job.publish("overall_score", value)
+        elif event == "summary":
+            job.publish("summary", value)
+        elif event == "checkpoint":
+            evaluated += 1
+            category_id, checkpoint_id, checkpoint = value
+            job.report(
+                f"Evaluated {evaluated}/{total_checkpoints} checkpoints · "
+                f"{checkpoint_id}: {checkpoint.get('status', '')}",
+                0.05 + 0.95 * evaluated / total_checkpoints
+            )
+        elif event == "category":
+            category_id, category_data = value
+            job.publish("categories", category_data, category_id)
+        elif event == "result":
+            result = value
+    
+    return result
 
 def analyze_video_upload():
     """Handle video upload and analysis"""
@@ -283,28 +320,37 @@ def analyze_video_upload():
     if uploaded_file is not None:
         st.video(uploaded_file)
         
+        frame_selection = st.radio(
+            "Frame selection",
+            ["scene", "uniform"],
+            format_func=lambda option: "Distinct key frames" if option == "scene" else "Evenly spaced frames",
+            horizontal=True,
+            help="Key frames skip repeated static screens and catch brief dialogs"
+        )
+        
+        batched = st.checkbox(
+            "Analyze all frames in one request",
+            help="Sends the extracted frames together so the heuristics prompt is only paid for once"
+        )
+        
         if st.button("Analyze Video", type="primary"):
-            with st.spinner("Extracting frames and analyzing video..."):
-                # Save uploaded file temporarily
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    tmp_path = tmp_file.name
-                
+            # Save uploaded file temporarily; the job removes it when done
+            with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as tmp_file:
+                tmp_file.write(uploaded_file.getvalue())
+                tmp_path = tmp_file.name
+            
+            analyzer = st.session_state.analyzer
+            
+            def analyze_video(job: Job) -> Dict[str, Any]:
                 try:
-                    # Analyze the video
-                    result = st.session_state.analyzer.analyze_video(tmp_path)
-                    st.session_state.analysis_result = result
-                    
-                    # Clean up temporary file
-                    os.unlink(tmp_path)
-                    
-                    st.success("Video analysis completed!")
-                    st.rerun()
-                    
-                except Exception as e:
-                    st.error(f"Video analysis failed: {str(e)}")
+                    return analyzer.analyze_video(
+                        tmp_path, batched=batched, frame_selection=frame_selection, progress=job.report
+                    )
+                finally:
                     if os.path.exists(tmp_path):
                         os.unlink(tmp_path)
+            
+            submit_analysis("video", uploaded_file.name, analyze_video)
 
 def analyze_website_url():
     """Handle website URL analysis"""
@@ -327,21 +373,72 @@ def analyze_website_url():
         if not url.startswith(('http://', 'https://')):
             url = 'https://' + url
         
+        tiled = st.checkbox(
+            "Analyze full page in viewport-sized tiles",
+            help="Long pages are split into overlapping sections analyzed in parallel, so details stay legible"
+        )
+        
         if st.button("Analyze Website", type="primary"):
-            with st.spinner(f"Capturing screenshot and analyzing {url}..."):
-                try:
-                    # Analyze the website
-                    result = st.session_state.analyzer.analyze_website(url)
-                    st.session_state.analysis_result = result
-                    
-                    if 'error' in result:
-                        st.error(result['error'])
-                    else:
-                        st.success("Website analysis completed!")
-                        st.rerun()
-                    
-                except Exception as e:
-                    st.error(f"Website analysis failed: {str(e)}")
+            analyzer = st.session_state.analyzer
+            submit_analysis("website", url,
+                            lambda job: analyzer.analyze_website(url, tiled=tiled, progress=job.report))
+
+def display_jobs():
+    """List this session's analysis jobs, polling while any of them is still running"""
+    jobs = get_job_manager().jobs(st.session_state.job_ids)
+    # Ids of jobs dropped by the manager are forgotten too
+    st.session_state.job_ids = [job.id for job in jobs]
+    if not jobs:
+        return
+    
+    active = any(not job.done for job in jobs)
+    
+    @st.fragment(run_every=1.0 if active else None)
+    def jobs_panel():
+        st.markdown("### Analyses")
+        finished_now = False
+        for job in reversed(get_job_manager().jobs(st.session_state.job_ids)):
+            snapshot = job.snapshot()
+            icon = {"queued": "⏳", "running": "🔄", "done": "✅", "failed": "❌", "cancelled": "⏹️"}[snapshot['status']]
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                st.markdown(f"{icon} **{snapshot['label']}** · {snapshot['kind']} · {snapshot['elapsed_seconds']} s")
+                if job.done:
+                    st.caption(snapshot['message'])
+                else:
+                    st.progress(snapshot['fraction'], text=snapshot['message'])
+            with col2:
+                if not job.done:
+                    if st.button("Cancel", key=f"cancel_{job.id}"):
+                        get_job_manager().cancel(job.id)
+                        st.rerun(scope="fragment")
+                else:
+                    if job.result is not None and st.button("View", key=f"view_{job.id}"):
+                        st.session_state.analysis_result = job.result
+                        st.rerun(scope="app")
+                    if st.button("Remove", key=f"remove_{job.id}"):
+                        get_job_manager().forget(job.id)
+                        st.session_state.job_ids.remove(job.id)
+                        st.rerun(scope="app")
+            
+            if not job.done and snapshot['partial'].get('categories'):
+                with st.expander(f"Results so far ({len(snapshot['partial']['categories'])} categories)"):
+                    if 'overall_score' in snapshot['partial']:
+                        st.caption(f"Overall score: {snapshot['partial']['overall_score']}")
+                    for category_id, category_data in snapshot['partial']['categories'].items():
+                        display_category(category_id, category_data)
+            
+            # Show each job's result once, as soon as it finishes
+            if job.done and job.id not in st.session_state.shown_job_ids:
+                st.session_state.shown_job_ids.add(job.id)
+                if job.result is not None and job.status != "cancelled":
+                    st.session_state.analysis_result = job.result
+                finished_now = True
+        
+        if finished_now:
+            st.rerun(scope="app")
+    
+    jobs_panel()
 
 def display_analysis_results():
     """Display the analysis results"""
@@ -428,6 +525,51 @@ def main():
             ["📷 Image Upload", "🎥 Video Upload", "🌐 Website URL"]
         )
         
+        prompt_profile = st.selectbox(
+            "Prompt profile:",
+            PROMPT_PROFILES,
+            index=PROMPT_PROFILES.index(st.session_state.analyzer.prompt_profile),
+            help="full includes every checkpoint's context; compact and ids send shorter "
+                 "prompts and get terse answers, which is faster and cheaper"
+        )
+        if prompt_profile != st.session_state.analyzer.prompt_profile:
+            st.session_state.analyzer = get_shared_analyzer(prompt_profile)
+        
+        cache = st.session_state.analyzer.cache
+        if cache:
+            st.markdown("---")
+            st.markdown("### Result Cache")
+            cache_stats = cache.stats()
+            st.caption(
+                f"{cache_stats['entries']} cached results · "
+                f"{cache_stats['hits']} hits / {cache_stats['misses']} misses since startup · "
+                f"{st.session_state.analyzer.calls_avoided()} model calls avoided"
+            )
+            metrics = st.session_state.analyzer.metrics
+            st.caption(
+                f"Image preprocessing saved {metrics['bytes_saved'] / 1024:.0f} KB "
+                f"and ~{metrics['image_tokens_saved']} image tokens"
+            )
+            if metrics["parse_failures"]:
+                st.caption(
+                    f"{st.session_state.analyzer.parse_failure_rate():.1%} of responses needed a repair "
+                    f"({metrics['repair_calls']} repair calls)"
+                )
+            if metrics["prompt_tokens"]:
+                st.caption(
+                    f"Prompt cache: {metrics['cached_prompt_tokens']} of {metrics['prompt_tokens']} "
+                    f"prompt tokens served from the provider cache"
+                )
+        
+        scheduler_stats = st.session_state.analyzer.scheduler.stats()
+        if scheduler_stats["completed"] or scheduler_stats["queue_depth"]:
+            st.caption(
+                f"API queue: {scheduler_stats['queue_depth']} waiting · "
+                f"{scheduler_stats['requests_in_window']} requests / {scheduler_stats['tokens_in_window']} "
+                f"tokens in the last minute · mean wait {scheduler_stats['mean_wait_seconds']:.1f} s · "
+                f"{scheduler_stats['rate_limited']} rate limited"
+            )
+        
         st.markdown("---")
         st.markdown("### About")
         st.markdown("""
@@ -453,6 +595,8 @@ def main():
     else:  # Website URL
         analyze_website_url()
     
+    display_jobs()
+    
     # Display results if available
     if st.session_state.analysis_result:
         st.markdown("---")
@@ -0,0 +1,478 @@
+"""
+Batch Crawl Mode
+Captures and analyzes many pages of a site from a URL list, a sitemap or a
+bounded same-origin crawl, writing results incrementally as JSONL
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import xml.etree.ElementTree as ET
+from collections import deque
+from html.parser import HTMLParser
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+from urllib.parse import urldefrag, urljoin, urlsplit
+import requests
+
+SITEMAP_NAMESPACE = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+# Links to these are files, not pages worth a UX screenshot
+_SKIPPED_EXTENSIONS = (".pdf", ".zip", ".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".mp4", ".mp3",
+                       ".css", ".js", ".xml", ".json")
+
+
+def load_url_list(path: str) -> List[str]:
+    """Read one URL per line, ignoring blank lines and # comments"""
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def parse_sitemap(sitemap_url: str, max_urls: int = 1000, timeout: float = 10.0) -> List[str]:
+    """
+    Collect page URLs from a sitemap.xml, following nested sitemap indexes
+
+    Args:
+        sitemap_url: URL of the sitemap or sitemap index
+        max_urls: Stop after this many page URLs
+        timeout: Per-request timeout in seconds
+
+    Returns:
+        Page URLs in sitemap order
+    """
+    urls: List[str] = []
+    pending = deque([sitemap_url])
+    seen_sitemaps: Set[str] = set()
+    while pending and len(urls) < max_urls:
+        current = pending.popleft()
+        if current in seen_sitemaps:
+            continue
+        seen_sitemaps.add(current)
+        response = requests.get(current, timeout=timeout)
+        response.raise_for_status()
+        root = ET.fromstring(response.content)
+        # Elements may or may not carry the sitemap namespace
+        tag = root.tag.replace(SITEMAP_NAMESPACE, "")
+        locations = [loc.text.strip() for loc in root.iter() if loc.tag.replace(SITEMAP_NAMESPACE, "") == "loc"
+                     and loc.text]
+        if tag == "sitemapindex":
+            pending.extend(locations)
+        else:
+            urls.extend(locations)
+    return list(dict.fromkeys(urls))[:max_urls]
+
+
+class _LinkParser(HTMLParser):
+    """Collect href targets of anchor tags"""
+
+    def __init__(self):
+        super().__init__()
+        self.links: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            href = dict(attrs).get("href")
+            if href:
+                self.links.append(href)
+
+
+def crawl_same_origin(start_url: str, max_pages: int = 50, max_depth: int = 2,
+                      timeout: float = 10.0) -> List[str]:
+    """
+    Breadth-first crawl of pages on the start URL's origin
+
+    Only HTML responses are followed; fragments are dropped and file links
+    skipped. The crawl fetches plain HTML with requests, which is much cheaper
+    than loading every page in a browser just to discover links.
+
+    Args:
+        start_url: First page to visit
+        max_pages: Maximum number of pages returned
+        max_depth: Maximum link distance from the start page
+        timeout: Per-request timeout in seconds
+
+    Returns:
+        Discovered page URLs in crawl order, starting with start_url
+    """
+    origin = urlsplit(start_url)[:2]
+    pages: List[str] = []
+    seen = {urldefrag(start_url)[0]}
+    queue = deque([(urldefrag(start_url)[0], 0)])
+    while queue and len(pages) < max_pages:
+        url, depth = queue.popleft()
+        try:
+            response = requests.get(url, timeout=timeout)
+        except requests.RequestException as e:
+            print(f"Crawl skipped {url}: {e}")
+            continue
+        if response.status_code >= 400 or "html" not in response.headers.get("Content-Type", ""):
+            continue
+        pages.append(url)
+        if depth >= max_depth:
+            continue
+
+        parser = _LinkParser()
+        parser.feed(response.text)
+        for href in parser.links:
+            link = urldefrag(urljoin(url, href))[0]
+            parts = urlsplit(link)
+            if parts[:2] != origin or link in seen or parts.path.lower().endswith(_SKIPPED_EXTENSIONS):
+                continue
+            seen.add(link)
+            queue.append((link, depth + 1))
+    return pages
+
+
+def load_completed(output_path: str, key: str = "url") -> Dict[str, Dict[str, Any]]:
+    """Records already written to a results file, keyed by their key field, skipping failed ones"""
+    completed: Dict[str, Dict[str, Any]] = {}
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by an interruption
+                continue
+            if record.get(key) and "error" not in record:
+                completed[record[key]] = record
+    return completed
+
+
+def site_rollup(records: Iterable[Dict[str, Any]], worst_pages: int = 5) -> Dict[str, Any]:
+    """
+    Summarize page results into site-level scores
+
+    Returns:
+        Dict with the page counts, the mean overall score, per-category mean
+        and minimum scores, the checkpoints that fail on the most pages and
+        the lowest-scoring pages
+    """
+    records = [record for record in records if "error" not in record]
+    categories: Dict[str, Dict[str, Any]] = {}
+    checkpoint_issues: Dict[str, Dict[str, Any]] = {}
+    for record in records:
+        for cat_id, category in record.get("categories", {}).items():
+            summary = categories.setdefault(cat_id, {"title": category.get("title", cat_id), "scores": []})
+            summary["scores"].append(category.get("score", 0))
+            for cp_id, checkpoint in category.get("checkpoints", {}).items():
+                if checkpoint.get("status") in ("FAIL", "NEEDS_ATTENTION"):
+                    issue = checkpoint_issues.setdefault(cp_id, {
+                        "checkpoint": cp_id,
+                        "category": cat_id,
+                        "fail_pages": 0,
+                        "needs_attention_pages": 0,
+                    })
+                    issue["fail_pages" if checkpoint["status"] == "FAIL" else "needs_attention_pages"] += 1
+
+    category_summary = {
+        cat_id: {
+            "title": summary["title"],
+            "mean_score": round(sum(summary["scores"]) / len(summary["scores"]), 1),
+            "min_score": min(summary["scores"]),
+            "pages": len(summary["scores"]),
+        }
+        for cat_id, summary in sorted(categories.items())
+    }
+    overall_scores = [record.get("overall_score", 0) for record in records]
+    common_issues = sorted(checkpoint_issues.values(),
+                           key=lambda issue: (issue["fail_pages"], issue["needs_attention_pages"]), reverse=True)
+    lowest = sorted(records, key=lambda record: record.get("overall_score", 0))[:worst_pages]
+
+    return {
+        "pages_analyzed": len(records),
+        "mean_overall_score": round(sum(overall_scores) / len(overall_scores), 1) if overall_scores else 0,
+        "categories": category_summary,
+        "common_issues": common_issues[:10],
+        "lowest_scoring_pages": [
+            {"url": record["url"], "overall_score": record.get("overall_score", 0)} for record in lowest
+        ],
+    }
+
+
+class BatchCrawler:
+    def __init__(self, analyzer=None, output_path: str = "crawl_results.jsonl",
+                 capture_concurrency: int = 2, analysis_concurrency: int = 4, tiled: bool = False,
+                 capture_factory: Optional[Callable[[], Any]] = None):
+        """
+        Initialize the batch crawler
+
+        Capture and analysis run as separate pipeline stages with their own
+        concurrency limits, so browsers keep loading the next pages while
+        earlier screenshots wait on the model.
+
+        Args:
+            analyzer: UXAnalyzer used for every page (created if not given)
+            output_path: JSONL file that results are appended to
+            capture_concurrency: Pages loaded in browsers at once; should not
+                exceed the driver pool size
+            analysis_concurrency: Model requests in flight at once
+            tiled: Analyze full-page screenshots as viewport-sized tiles
+            capture_factory: Builds a WebsiteCapture-like object per page
+        """
+        if analyzer is None:
+            from request_scheduler import BATCH
+            from ux_analyzer import UXAnalyzer
+            # Crawls yield to interactive analyses in the shared request scheduler
+            analyzer = UXAnalyzer(priority=BATCH)
+        if capture_factory is None:
+            from website_capture import WebsiteCapture
+            capture_factory = WebsiteCapture
+        self.analyzer = analyzer
+        self.output_path = output_path
+        self.capture_concurrency = capture_concurrency
+        self.analysis_concurrency = analysis_concurrency
+        self.tiled = tiled
+        self.capture_factory = capture_factory
+
+    def _capture(self, url: str):
+        """Capture one page in memory; a fresh capture object keeps timings per page"""
+        capture = self.capture_factory()
+        screenshot = capture.capture_website_bytes(url, quality=self.analyzer.image_quality)
+        return screenshot, capture.last_timings
+
+    async def _process(self, url: str, capture_slots: asyncio.Semaphore,
+                       analysis_slots: asyncio.Semaphore) -> Dict[str, Any]:
+        """Run one URL through the capture and analysis stages"""
+        start = time.perf_counter()
+        try:
+            async with capture_slots:
+                screenshot, capture_timings = await asyncio.to_thread(self._capture, url)
+            if not screenshot:
+                return {"url": url, "error": "Failed to capture website screenshot"}
+            capture_seconds = time.perf_counter() - start
+
+            analysis_start = time.perf_counter()
+            async with analysis_slots:
+                if self.tiled:
+                    result = await self.analyzer.analyze_image_tiled_async(screenshot)
+                else:
+                    result = await self.analyzer.analyze_image_async(screenshot)
+            record = {"url": url, **result}
+            record["capture_seconds"] = round(capture_seconds, 3)
+            record["analysis_seconds"] = round(time.perf_counter() - analysis_start, 3)
+            if capture_timings:
+                record["capture_timings"] = capture_timings
+            return record
+        except Exception as e:
+            return {"url": url, "error": f"Website analysis failed: {str(e)}"}
+
+    async def run_async(self, urls: Iterable[str], resume: bool = True) -> Dict[str, Any]:
+        """
+        Analyze every URL, appending each result to the output file as it completes
+
+        Args:
+            urls: Pages to analyze
+            resume: Skip URLs that already have a successful record in the output file
+
+        Returns:
+            Site rollup over all successful records, including earlier runs
+        """
+        completed = load_completed(self.output_path) if resume else {}
+        pending = [url for url in dict.fromkeys(urls) if url not in completed]
+        if completed:
+            print(f"Resuming: {len(completed)} pages already done, {len(pending)} to go")
+
+        capture_slots = asyncio.Semaphore(self.capture_concurrency)
+        analysis_slots = asyncio.Semaphore(self.analysis_concurrency)
+        records = list(completed.values())
+        tasks = [asyncio.create_task(self._process(url, capture_slots, analysis_slots)) for url in pending]
+
+        with open(self.output_path, "a" if resume else "w", encoding="utf-8") as output:
+            for done, task in enumerate(asyncio.as_completed(tasks), 1):
+                record = await task
+                # One line per page, flushed so an interruption loses at most the pages in flight
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+                records.append(record)
+                status = record.get("error") or f"score {record.get('overall_score', 0)}"
+                print(f"[{done}/{len(tasks)}] {record['url']}: {status}")
+
+        rollup = site_rollup(records)
+        rollup["pages_failed"] = sum(1 for record in records if "error" in record)
+        return rollup
+
+    def run(self, urls: Iterable[str], resume: bool = True) -> Dict[str, Any]:
+        """Blocking wrapper around run_async"""
+        return asyncio.run(self.run_async(urls, resume))
+
+
+def test_batch_crawl():
+    """Crawl a local fixture site against a stub model endpoint, then check JSONL output, resume and rollup"""
+    import base64
+    import shutil
+    import tempfile
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from io import BytesIO
+    from PIL import Image
+
+    # Each page's screenshot is a flat grey whose level the stub model reads back as the score
+    scores = {"/": 80, "/pricing": 60, "/about": 90, "/contact": 40}
+    pages = {path: f"<html><body><h1>{path}</h1>" + "".join(
+        f'<a href="{link}">{link}</a>' for link in scores) + "</body></html>" for path in scores}
+    state: Dict[str, Any] = {"base": "", "model_calls": 0}
+
+    def sitemap(locations: List[str], tag: str, item: str) -> bytes:
+        entries = "".join(f"<{item}><loc>{state['base']}{location}</loc></{item}>" for location in locations)
+        return f'<?xml version="1.0"?><{tag} xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</{tag}>'.encode()
+
+    def analysis(request: Dict[str, Any]) -> str:
+        image_url = request["messages"][-1]["content"][0]["image_url"]["url"]
+        with Image.open(BytesIO(base64.b64decode(image_url.split(",", 1)[1]))) as image:
+            score = round(image.convert("L").getpixel((0, 0)) / 2.55 / 10) * 10
+        schema = request["response_format"]["json_schema"]["schema"]["properties"]["categories"]["properties"]
+        categories = {}
+        for category_id, category in schema.items():
+            checkpoint_ids = list(category["properties"]["checkpoints"]["properties"])
+            categories[category_id] = {"title": category_id, "score": score, "checkpoints": {
+                checkpoint_id: {"status": "FAIL" if score < 70 and index == 0 else "PASS", "confidence": 4,
+                                "reasoning": "stub", "recommendation": "stub"}
+                for index, checkpoint_id in enumerate(checkpoint_ids)}}
+        return json.dumps({"overall_score": score, "summary": "stub", "categories": categories,
+                           "priority_issues": [], "strengths": []})
+
+    class FixtureHandler(BaseHTTPRequestHandler):
+        def _send(self, status: int, content_type: str, body: bytes):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/sitemap.xml":
+                self._send(200, "application/xml", sitemap(["/sitemap-pages.xml"], "sitemapindex", "sitemap"))
+            elif self.path == "/sitemap-pages.xml":
+                self._send(200, "application/xml", sitemap(list(scores), "urlset", "url"))
+            elif self.path in pages:
+                self._send(200, "text/html", pages[self.path].encode())
+            else:
+                self._send(404, "text/plain", b"")
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            state["model_calls"] += 1
+            body = json.dumps({
+                "id": "stub", "object": "chat.completion", "created": 0, "model": "stub",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": analysis(request)}}],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 10, "total_tokens": 20},
+            }).encode()
+            self._send(200, "application/json", body)
+
+        def log_message(self, *args):
+            pass
+
+    class StubCapture:
+        """Loads the fixture page over HTTP and renders a flat image in place of a browser screenshot"""
+        wait_for_lines = 0
+
+        def __init__(self):
+            self.last_timings: Dict[str, float] = {}
+
+        def capture_website_bytes(self, url: str, quality: int = 80) -> bytes:
+            path = urlsplit(url).path or "/"
+            requests.get(url, timeout=5).raise_for_status()
+            if path == "/contact":
+                # Hold the last page until earlier results are on disk, proving output is incremental
+                deadline = time.time() + 5
+                while time.time() < deadline and _line_count(output_path) < StubCapture.wait_for_lines:
+                    time.sleep(0.05)
+                state["lines_before_last_capture"] = _line_count(output_path)
+            buffer = BytesIO()
+            Image.new("RGB", (640, 400), (round(scores[path] * 2.55),) * 3).save(buffer, format="PNG")
+            self.last_timings = {"total": 0.0}
+            return buffer.getvalue()
+
+    def _line_count(path: str) -> int:
+        if not os.path.exists(path):
+            return 0
+        with open(path, "r", encoding="utf-8") as f:
+            return sum(1 for _ in f)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state["base"] = f"http://127.0.0.1:{server.server_address[1]}"
+    work_dir = tempfile.mkdtemp(prefix="ux_batch_crawl_")
+    output_path = os.path.join(work_dir, "results.jsonl")
+    # A key of its own gets a fresh shared client, which reads the stub's base URL
+    previous_env = {name: os.environ.get(name) for name in ("OPENAI_BASE_URL", "OPENAI_API_KEY")}
+    os.environ["OPENAI_BASE_URL"] = f"{state['base']}/v1"
+    os.environ["OPENAI_API_KEY"] = "sk-batch-crawl-test"
+    try:
+        from ux_analyzer import UXAnalyzer
+        analyzer = UXAnalyzer(cache_dir=None)
+
+        urls = parse_sitemap(f"{state['base']}/sitemap.xml")
+        assert urls == [state["base"] + path for path in scores], urls
+        crawled = crawl_same_origin(state["base"] + "/", max_depth=1)
+        assert sorted(crawled) == sorted(urls), crawled
+
+        crawler = BatchCrawler(analyzer, output_path, capture_concurrency=1, analysis_concurrency=1,
+                               capture_factory=StubCapture)
+        # First run stops after two pages, as if interrupted
+        crawler.run(urls[:2])
+        assert _line_count(output_path) == 2 and state["model_calls"] == 2
+
+        StubCapture.wait_for_lines = 3
+        rollup = crawler.run(urls)
+        assert state["model_calls"] == 4, f"resume re-analyzed completed pages: {state['model_calls']} calls"
+        assert state["lines_before_last_capture"] >= 3, "results were not written as pages completed"
+        records = [json.loads(line) for line in open(output_path, encoding="utf-8")]
+        assert sorted(record["url"] for record in records) == sorted(urls)
+
+        assert rollup["pages_analyzed"] == 4, rollup
+        assert rollup["mean_overall_score"] == sum(scores.values()) / len(scores), rollup
+        assert rollup["lowest_scoring_pages"][0]["url"] == state["base"] + "/contact"
+        assert rollup["common_issues"][0]["fail_pages"] == 2, rollup["common_issues"][0]
+        print(f"Sitemap and crawl found {len(urls)} pages; resume skipped 2; "
+              f"{state['lines_before_last_capture']} lines on disk before the last capture")
+        print(f"Rollup: mean {rollup['mean_overall_score']}, lowest {rollup['lowest_scoring_pages'][0]}")
+    finally:
+        for name, value in previous_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze many pages of a site")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--urls", help="File with one URL per line")
+    source.add_argument("--sitemap", help="URL of a sitemap.xml")
+    source.add_argument("--crawl", help="Start URL for a same-origin crawl")
+    parser.add_argument("--max-pages", type=int, default=50)
+    parser.add_argument("--max-depth", type=int, default=2)
+    parser.add_argument("--output", default="crawl_results.jsonl")
+    parser.add_argument("--capture-concurrency", type=int, default=2)
+    parser.add_argument("--analysis-concurrency", type=int, default=4)
+    parser.add_argument("--tiled", action="store_true")
+    parser.add_argument("--no-resume", action="store_true", help="Start over instead of skipping completed URLs")
+    args = parser.parse_args()
+
+    if args.urls:
+        urls = load_url_list(args.urls)[:args.max_pages]
+    elif args.sitemap:
+        urls = parse_sitemap(args.sitemap, max_urls=args.max_pages)
+    else:
+        urls = crawl_same_origin(args.crawl, max_pages=args.max_pages, max_depth=args.max_depth)
+    print(f"{len(urls)} pages to analyze")
+
+    crawler = BatchCrawler(output_path=args.output, capture_concurrency=args.capture_concurrency,
+                           analysis_concurrency=args.analysis_concurrency, tiled=args.tiled)
+    rollup = crawler.run(urls, resume=not args.no_resume)
+    print(json.dumps(rollup, indent=2))
+
+
+if __name__ == "__main__":
+    import sys
+    if "--test" in sys.argv:
+        test_batch_crawl()
+    else:
+        main()
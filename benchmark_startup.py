@@ -0,0 +1,147 @@
+"""
+Startup Benchmark
+Measures cold import time of the app's modules and resident memory per
+browser session, for sizing the app's autoscaled pods
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+HEAVY_MODULES = ("cv2", "selenium", "langchain_openai", "requests", "streamlit")
+
+# Run in a fresh interpreter so nothing is imported yet
+_IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def rss_mb() -> float:
+    """Current resident set size in MB (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/status", encoding="utf-8") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and KB elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def measure_import(module: str, repeats: int = 3) -> Dict[str, Any]:
+    """
+    Cold import time of a module, taking the best of several fresh interpreters
+
+    Returns:
+        Seconds and the heavy optional modules the import pulled in
+    """
+    timings = []
+    heavy: List[str] = []
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, "-c", _IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            capture_output=True, text=True, cwd=os.path.dirname(APP_PATH), check=True
+        ).stdout
+        probe = json.loads(output.strip().splitlines()[-1])
+        timings.append(probe["seconds"])
+        heavy = probe["heavy"]
+    return {"module": module, "seconds": round(min(timings), 3), "heavy": heavy}
+
+
+def measure_sessions(sessions: int = 5) -> Dict[str, Any]:
+    """
+    Run the app script for several simulated browser sessions in this process
+
+    The first run includes the cold start (imports, shared analyzer); later
+    runs show what each additional session costs. Sessions are kept alive so
+    their state counts towards RSS, as it would on a server.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    baseline = rss_mb()
+    alive = []
+    timings = []
+    memory = []
+    for _ in range(sessions):
+        start = time.perf_counter()
+        app = AppTest.from_file(APP_PATH, default_timeout=120).run()
+        timings.append(time.perf_counter() - start)
+        if app.exception:
+            raise RuntimeError(f"App failed to start: {app.exception[0].message}")
+        alive.append(app)
+        memory.append(rss_mb())
+
+    extra_sessions = max(1, sessions - 1)
+    return {
+        "sessions": sessions,
+        "cold_start_seconds": round(timings[0], 3),
+        "warm_session_seconds": round(sum(timings[1:]) / extra_sessions, 3) if sessions > 1 else None,
+        "rss_baseline_mb": round(baseline, 1),
+        "rss_after_first_session_mb": round(memory[0], 1),
+        "rss_per_extra_session_mb": round((memory[-1] - memory[0]) / extra_sessions, 2) if sessions > 1 else None,
+    }
+
+
+def measure_analyzer_instances(instances: int = 5) -> Dict[str, Any]:
+    """Time and RSS per UXAnalyzer instance, the cost a session pays if it builds its own"""
+    from ux_analyzer import UXAnalyzer
+
+    UXAnalyzer(cache_dir=None)
+    before = rss_mb()
+    alive = []
+    start = time.perf_counter()
+    for _ in range(instances):
+        alive.append(UXAnalyzer(cache_dir=None))
+    elapsed = time.perf_counter() - start
+    return {
+        "seconds_per_analyzer": round(elapsed / instances, 4),
+        "rss_per_analyzer_mb": round((rss_mb() - before) / instances, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure app cold start and memory per session")
+    parser.add_argument("--sessions", type=int, default=5, help="Browser sessions to simulate")
+    parser.add_argument("--modules", nargs="*", default=["ux_analyzer", "analysis_jobs", "website_capture", "streamlit"],
+                        help="Modules to time a cold import of")
+    args = parser.parse_args()
+
+    # The analyzer needs a key to start; nothing is sent to the API
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    os.chdir(os.path.dirname(APP_PATH))
+
+    print("Cold imports (best of 3):")
+    for module in args.modules:
+        result = measure_import(module)
+        heavy = ", ".join(result["heavy"]) or "none"
+        print(f"  {result['module']:<20} {result['seconds']:6.3f} s   heavy modules loaded: {heavy}")
+
+    analyzers = measure_analyzer_instances()
+    print(f"\nUXAnalyzer construction: {analyzers['seconds_per_analyzer'] * 1000:.1f} ms, "
+          f"{analyzers['rss_per_analyzer_mb']:.2f} MB each")
+
+    sessions = measure_sessions(args.sessions)
+    print(f"\nApp sessions ({sessions['sessions']}):")
+    print(f"  cold start            {sessions['cold_start_seconds']:.3f} s")
+    if sessions["warm_session_seconds"] is not None:
+        print(f"  each further session  {sessions['warm_session_seconds']:.3f} s")
+    print(f"  RSS                   {sessions['rss_baseline_mb']:.1f} MB before, "
+          f"{sessions['rss_after_first_session_mb']:.1f} MB after the first session")
+    if sessions["rss_per_extra_session_mb"] is not None:
+        print(f"  RSS per extra session {sessions['rss_per_extra_session_mb']:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
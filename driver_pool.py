@@ -0,0 +1,294 @@
+"""
+Chrome Driver Pool
+Keeps warm headless Chrome instances so website captures don't pay browser startup each time
+"""
+
+import functools
+import json
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Set
+from urllib.parse import urlsplit
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.common.exceptions import WebDriverException
+
+DESKTOP_WINDOW_SIZE = (1920, 1080)
+
+
+@functools.lru_cache(maxsize=1)
+def chromedriver_path() -> str:
+    """
+    Resolve the ChromeDriver binary once per process
+
+    ChromeDriverManager().install() does a network version check on every
+    call, so the result is cached. CHROMEDRIVER_PATH skips the lookup entirely.
+    """
+    configured_path = os.getenv("CHROMEDRIVER_PATH")
+    if configured_path:
+        return configured_path
+    from webdriver_manager.chrome import ChromeDriverManager
+    return ChromeDriverManager().install()
+
+
+def default_chrome_options() -> Options:
+    """Headless Chrome options shared by every pooled driver"""
+    chrome_options = Options()
+    chrome_options.add_argument('--headless')
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    chrome_options.add_argument('--disable-gpu')
+    chrome_options.add_argument('--disable-extensions')
+    chrome_options.add_argument('--disable-plugins')
+    chrome_options.add_argument(f'--window-size={DESKTOP_WINDOW_SIZE[0]},{DESKTOP_WINDOW_SIZE[1]}')
+    # Network events in the performance log let captures wait for in-flight requests
+    chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    return chrome_options
+
+
+def url_origin(url: str) -> Optional[str]:
+    """scheme://host[:port] of an http(s) URL, or None for other schemes"""
+    parts = urlsplit(url)
+    if parts.scheme in ("http", "https") and parts.netloc:
+        return f"{parts.scheme}://{parts.netloc}"
+    return None
+
+
+def drain_network_log(driver, in_flight: Set[str], origins: Optional[Set[str]] = None) -> bool:
+    """Update the set of in-flight request ids from the performance log
+
+    Every entry read is consumed, so callers that need to know which origins
+    the page talked to pass origins to collect them.
+
+    Returns False if the driver has no performance log available.
+    """
+    try:
+        entries = driver.get_log("performance")
+    except Exception:
+        return False
+    for entry in entries:
+        try:
+            message = json.loads(entry["message"])["message"]
+        except (KeyError, ValueError):
+            continue
+        method = message.get("method")
+        params = message.get("params", {})
+        request_id = params.get("requestId")
+        if method == "Network.requestWillBeSent":
+            in_flight.add(request_id)
+            if origins is not None:
+                origin = url_origin(params.get("request", {}).get("url", ""))
+                if origin:
+                    origins.add(origin)
+        elif method in ("Network.loadingFinished", "Network.loadingFailed"):
+            in_flight.discard(request_id)
+    return True
+
+
+class DriverPool:
+    def __init__(self, size: int = 2, max_uses: int = 50,
+                 options_factory: Callable[[], Options] = default_chrome_options,
+                 profile_dir: Optional[str] = None):
+        """
+        Initialize the driver pool
+
+        Args:
+            size: Maximum number of live Chrome instances
+            max_uses: Captures served by one driver before it is recycled
+            options_factory: Builds the Chrome options for each new driver
+            profile_dir: Keep browser profiles and HTTP caches here across
+                launches, so repeat captures of a site reuse its static assets.
+                Each live browser gets its own numbered subdirectory because
+                Chrome locks a profile to one process.
+        """
+        self.size = size
+        self.max_uses = max_uses
+        self.options_factory = options_factory
+        self.profile_dir = profile_dir
+        self._profile_slots: Dict[int, int] = {}
+        self._idle: "queue.LifoQueue[webdriver.Chrome]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._uses: Dict[int, int] = {}
+        self._user_agents: Dict[int, str] = {}
+        self._origins: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.launched = 0
+        self.recycled = 0
+
+    def _launch(self) -> webdriver.Chrome:
+        """Start a new headless Chrome"""
+        options = self.options_factory()
+        slot = None
+        if self.profile_dir:
+            with self._lock:
+                slot = min(set(range(self.size)) - set(self._profile_slots.values()))
+            profile_path = os.path.abspath(os.path.join(self.profile_dir, f"chrome-{slot}"))
+            options.add_argument(f"--user-data-dir={profile_path}")
+            options.add_argument(f"--disk-cache-dir={os.path.join(profile_path, 'cache')}")
+        try:
+            service = Service(chromedriver_path())
+            driver = webdriver.Chrome(service=service, options=options)
+        except Exception as e:
+            raise Exception(f"Failed to setup Chrome driver: {str(e)}")
+        with self._lock:
+            self._uses[id(driver)] = 0
+            if slot is not None:
+                self._profile_slots[id(driver)] = slot
+            self.launched += 1
+        # Remembered so a mobile user-agent override can be undone on reset
+        self._user_agents[id(driver)] = driver.execute_script("return navigator.userAgent")
+        return driver
+
+    def default_user_agent(self, driver: webdriver.Chrome) -> str:
+        """User agent the browser reported at launch, before any override"""
+        return self._user_agents.get(id(driver), "")
+
+    def seen_origins(self, driver: webdriver.Chrome) -> Set[str]:
+        """Origins the driver has sent requests to since its last reset
+
+        Captures add to this set while reading the network log, so the reset
+        can clear storage for every site that ran on the page, third parties
+        included.
+        """
+        with self._lock:
+            return self._origins.setdefault(id(driver), set())
+
+    def _is_healthy(self, driver: webdriver.Chrome) -> bool:
+        """Check that the browser still responds to commands"""
+        try:
+            return driver.execute_script("return 1") == 1
+        except Exception:
+            # A crashed chromedriver surfaces as urllib3/ConnectionError rather than WebDriverException
+            return False
+
+    def _discard(self, driver: webdriver.Chrome):
+        """Quit a driver and forget about it"""
+        with self._lock:
+            self._uses.pop(id(driver), None)
+            self._user_agents.pop(id(driver), None)
+            self._origins.pop(id(driver), None)
+            self.recycled += 1
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        # Only free the profile once Chrome has released its lock on it
+        with self._lock:
+            self._profile_slots.pop(id(driver), None)
+
+    def _reset(self, driver: webdriver.Chrome):
+        """Clear per-site state so the next capture starts from a clean browser"""
+        origins = self.seen_origins(driver)
+        last_origin = url_origin(driver.current_url)
+        if last_origin:
+            origins.add(last_origin)
+        # Leave the page first so its scripts can't write storage back
+        driver.get("about:blank")
+        drain_network_log(driver, set(), origins)
+        for origin in sorted(origins):
+            # Local/session storage, IndexedDB, service workers and cache storage
+            driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+        origins.clear()
+        # Every cookie in the browser, not just those of the origins seen
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": []})
+        driver.execute_cdp_cmd("Emulation.clearDeviceMetricsOverride", {})
+        driver.execute_cdp_cmd("Emulation.setTouchEmulationEnabled", {"enabled": False})
+        driver.execute_cdp_cmd("Emulation.setUserAgentOverride", {"userAgent": self.default_user_agent(driver)})
+        driver.set_window_size(*DESKTOP_WINDOW_SIZE)
+
+    def acquire(self, timeout: Optional[float] = None) -> webdriver.Chrome:
+        """
+        Take a healthy driver from the pool, launching one if none is idle
+
+        Blocks while all size drivers are in use.
+        """
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("Timed out waiting for a browser from the pool")
+        try:
+            while True:
+                try:
+                    driver = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._launch()
+                if self._is_healthy(driver):
+                    return driver
+                # Dead browsers are quit and replaced by the next idle one or a fresh launch
+                self._discard(driver)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, driver: webdriver.Chrome, broken: bool = False):
+        """Return a driver to the pool, recycling it if it crashed or is worn out"""
+        try:
+            with self._lock:
+                uses = self._uses.get(id(driver), 0) + 1
+                self._uses[id(driver)] = uses
+            if broken or uses >= self.max_uses:
+                self._discard(driver)
+                return
+            try:
+                self._reset(driver)
+            except Exception as e:
+                # The next acquire launches a replacement
+                print(f"Discarding browser that failed to reset: {e}")
+                self._discard(driver)
+                return
+            self._idle.put(driver)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def driver(self, timeout: Optional[float] = None) -> Iterator[webdriver.Chrome]:
+        """Borrow a driver for the duration of a with block"""
+        driver = self.acquire(timeout=timeout)
+        broken = False
+        try:
+            yield driver
+        except WebDriverException:
+            broken = True
+            raise
+        finally:
+            self.release(driver, broken=broken)
+
+    def close(self):
+        """Quit all idle drivers"""
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(driver)
+
+    def stats(self) -> Dict[str, int]:
+        """Pool size and lifetime counters"""
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize(),
+            "launched": self.launched,
+            "recycled": self.recycled,
+        }
+
+
+_shared_pool: Optional[DriverPool] = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_shared_pool() -> DriverPool:
+    """
+    Process-wide driver pool, sized by UX_ANALYZER_DRIVER_POOL_SIZE
+
+    Set UX_ANALYZER_BROWSER_PROFILE_DIR to keep browser HTTP caches on disk between runs.
+    """
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = DriverPool(
+                size=int(os.getenv("UX_ANALYZER_DRIVER_POOL_SIZE", "2")),
+                profile_dir=os.getenv("UX_ANALYZER_BROWSER_PROFILE_DIR") or None
+            )
+        return _shared_pool
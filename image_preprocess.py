@@ -0,0 +1,151 @@
+"""
+Image Preprocessing
+Prepares images for upload so the payload matches what the vision model actually sees
+"""
+
+import math
+from io import BytesIO
+from typing import Dict, Any, List, Tuple
+from PIL import Image
+
+# Vision models fit high-detail images into 2048x2048, then scale the shortest side down to 768
+MAX_DIMENSION = 2048
+SHORT_SIDE = 768
+TILE_SIZE = 512
+BASE_TOKENS = 85
+TOKENS_PER_TILE = 170
+
+_MIME_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+
+def detect_mime_type(image_bytes: bytes) -> str:
+    """Identify the image format from its magic bytes"""
+    for signature, mime_type in _MIME_SIGNATURES:
+        if image_bytes.startswith(signature):
+            return mime_type
+    if image_bytes[:4] == b"RIFF" and image_bytes[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+def effective_size(width: int, height: int) -> Tuple[int, int]:
+    """Resolution a high-detail image is reduced to before tokenization"""
+    scale = min(1.0, MAX_DIMENSION / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, SHORT_SIDE / min(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def estimate_image_tokens(width: int, height: int, detail: str = "high") -> int:
+    """Estimate the input tokens an image costs at the given detail level"""
+    if detail == "low":
+        return BASE_TOKENS
+    width, height = effective_size(width, height)
+    tiles = math.ceil(width / TILE_SIZE) * math.ceil(height / TILE_SIZE)
+    return BASE_TOKENS + TOKENS_PER_TILE * tiles
+
+
+def prepare_image(image_bytes: bytes, image_format: str = "JPEG", quality: int = 85,
+                  detail: str = "auto") -> Dict[str, Any]:
+    """
+    Downscale and re-encode an image for upload to the model
+
+    Pixels beyond the model's effective resolution are discarded by the API
+    anyway, so they are dropped before upload and the result is re-encoded as
+    compact JPEG or WebP. Small images use low detail, which costs a flat 85
+    tokens and loses nothing for images that fit in one 512px tile.
+
+    Args:
+        image_bytes: Encoded source image
+        image_format: "JPEG" or "WEBP"
+        quality: Encoder quality target (1-100)
+        detail: "low", "high" or "auto"
+
+    Returns:
+        Dict with the upload data, its MIME type, the detail level and the
+        byte and token counts before and after preprocessing
+    """
+    original_mime = detect_mime_type(image_bytes)
+    with Image.open(BytesIO(image_bytes)) as image:
+        image.load()
+        width, height = image.size
+        if detail == "auto":
+            detail = "low" if max(width, height) <= TILE_SIZE else "high"
+
+        if detail == "low":
+            scale = min(1.0, TILE_SIZE / max(width, height))
+            target_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        else:
+            target_size = effective_size(width, height)
+
+        # Flatten transparency onto white; JPEG has no alpha channel
+        if image.mode in ("RGBA", "LA", "P"):
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.split()[-1])
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+        if target_size != (width, height):
+            image = image.resize(target_size, Image.LANCZOS)
+
+        buffer = BytesIO()
+        image.save(buffer, format=image_format, quality=quality)
+        data = buffer.getvalue()
+
+    mime_type = f"image/{image_format.lower()}"
+    # Keep the original when re-encoding doesn't help and nothing was resized
+    if len(data) >= len(image_bytes) and target_size == (width, height) and original_mime != "application/octet-stream":
+        data, mime_type = image_bytes, original_mime
+
+    return {
+        "data": data,
+        "mime_type": mime_type,
+        "detail": detail,
+        "width": target_size[0],
+        "height": target_size[1],
+        "original_bytes": len(image_bytes),
+        "bytes": len(data),
+        "original_tokens": estimate_image_tokens(width, height, "high"),
+        "tokens": estimate_image_tokens(target_size[0], target_size[1], detail),
+    }
+
+
+def split_into_tiles(image_bytes: bytes, tile_height: int = 1080, overlap: int = 120) -> List[bytes]:
+    """
+    Split a tall full-page screenshot into viewport-sized overlapping tiles
+
+    Each tile keeps the full page width, so every request sees the content at
+    close to its native resolution instead of one heavily downscaled image.
+    The overlap keeps elements that straddle a tile boundary visible whole in
+    at least one tile.
+
+    Returns:
+        PNG-encoded tiles from top to bottom; a single tile if the image is short
+    """
+    with Image.open(BytesIO(image_bytes)) as image:
+        image.load()
+        width, height = image.size
+        if height <= tile_height:
+            return [image_bytes]
+
+        step = max(1, tile_height - overlap)
+        tops = list(range(0, height - tile_height, step))
+        last_top = height - tile_height
+        # A bottom-aligned tile adding less than the overlap of new content
+        # replaces the one before it instead of costing a request of its own
+        if len(tops) > 1 and last_top - tops[-1] < overlap:
+            tops[-1] = last_top
+        else:
+            tops.append(last_top)
+        tiles = []
+        for top in tops:
+            buffer = BytesIO()
+            image.crop((0, top, width, top + tile_height)).save(buffer, format="PNG")
+            tiles.append(buffer.getvalue())
+        return tiles
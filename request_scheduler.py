@@ -0,0 +1,425 @@
+"""
+Request Scheduler
+Process-wide gate for model calls: keeps requests and tokens per minute within
+budget, serves interactive work before batch work, and retries rate-limited
+and transient failures with jittered exponential backoff
+"""
+
+import asyncio
+import itertools
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Lower runs first
+INTERACTIVE = 0
+BATCH = 10
+
+# Rough input cost of one image part when the request doesn't say
+IMAGE_TOKEN_ESTIMATE = 1000
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def estimate_request_tokens(request: Dict[str, Any]) -> int:
+    """Approximate tokens a chat completion request counts against the TPM budget
+
+    Text is estimated at ~4 characters per token; the output budget
+    (max_tokens) counts in full, as it does for provider rate limits.
+    """
+    tokens = 0
+    for message in request.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            tokens += len(content) // 4
+            continue
+        for part in content or []:
+            if part.get("type") == "text":
+                tokens += len(part.get("text", "")) // 4
+            else:
+                tokens += IMAGE_TOKEN_ESTIMATE
+    return tokens + request.get("max_tokens", 0)
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None and getattr(error, "response", None) is not None:
+        status = getattr(error.response, "status_code", None)
+    return status
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, timeouts, connection failures and 5xx responses are worth retrying"""
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    # openai.APIConnectionError and APITimeoutError carry no status code
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError") or isinstance(
+        error, (ConnectionError, TimeoutError))
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Delay requested by the server through retry-after-ms or Retry-After, if any"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        # HTTP-date form; fall back to exponential backoff
+        return None
+    return None
+
+
+class RequestScheduler:
+    def __init__(self, requests_per_minute: int = 500, tokens_per_minute: int = 300_000,
+                 max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0,
+                 window_seconds: float = 60.0):
+        """
+        Initialize the scheduler
+
+        Args:
+            requests_per_minute: Request budget per rolling window
+            tokens_per_minute: Token budget per rolling window
+            max_retries: Retries per call before the error is raised
+            base_delay: First backoff delay in seconds, doubled per retry
+            max_delay: Upper bound on a single backoff delay
+            window_seconds: Length of the rolling budget window
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.window_seconds = window_seconds
+
+        self._condition = threading.Condition()
+        self._queue: List[Tuple[int, int, float]] = []
+        # Async callers are woken through their own loop instead of the condition
+        self._async_waiters: Dict[Tuple[int, int, float], Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = {}
+        self._sequence = itertools.count()
+        self._window: Deque[Tuple[float, int]] = deque()
+        self._window_tokens = 0
+        # A 429 pauses every caller, not just the one that received it
+        self._paused_until = 0.0
+
+        self.completed = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _prune(self, now: float):
+        while self._window and now - self._window[0][0] >= self.window_seconds:
+            self._window_tokens -= self._window.popleft()[1]
+
+    def _delay_until_allowed(self, tokens: int, now: float) -> float:
+        """Seconds until a request of this size fits the budgets; 0 if it fits now"""
+        self._prune(now)
+        delay = max(0.0, self._paused_until - now)
+        if len(self._window) >= self.requests_per_minute:
+            delay = max(delay, self._window[0][0] + self.window_seconds - now)
+        # An oversized request only waits for an empty window rather than forever
+        tokens = min(tokens, self.tokens_per_minute)
+        if self._window and self._window_tokens + tokens > self.tokens_per_minute:
+            freed = self._window_tokens
+            for timestamp, used in self._window:
+                freed -= used
+                if freed + tokens <= self.tokens_per_minute:
+                    delay = max(delay, timestamp + self.window_seconds - now)
+                    break
+        return delay
+
+    def _next_ticket(self, now: float) -> Optional[Tuple[int, int, float]]:
+        """Highest-priority, oldest ticket whose backoff has elapsed"""
+        ready = [ticket for ticket in self._queue if ticket[2] <= now]
+        return min(ready) if ready else None
+
+    def _turn(self, ticket: Tuple[int, int, float], tokens: int, now: float) -> Optional[float]:
+        """
+        Admit ticket if it may go now; otherwise say how long to wait
+
+        Must be called with the condition held.
+
+        Returns:
+            0 once admitted, seconds until something changes for this ticket,
+            or None to wait until another caller is admitted or leaves
+        """
+        if self._next_ticket(now) == ticket:
+            delay = self._delay_until_allowed(tokens, now)
+            if delay > 0:
+                return delay
+            self._window.append((now, tokens))
+            self._window_tokens += tokens
+            return 0
+        # Behind another caller: its admission wakes us, as does the end of our own backoff
+        return ticket[2] - now if ticket[2] > now else None
+
+    def _leave(self, ticket: Tuple[int, int, float], start: float) -> float:
+        """Drop ticket from the queue, wake the other waiters and record the wait; condition held"""
+        self._queue.remove(ticket)
+        self._async_waiters.pop(ticket, None)
+        self._condition.notify_all()
+        for loop, event in list(self._async_waiters.values()):
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The waiter's loop has closed; it is no longer waiting
+                pass
+        waited = time.monotonic() - start
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        return waited
+
+    def take_sequence(self) -> int:
+        """Place in line for a call; pass it to every acquire the call makes"""
+        return next(self._sequence)
+
+    def acquire(self, tokens: int = 0, priority: int = INTERACTIVE, not_before: float = 0.0,
+                sequence: Optional[int] = None) -> float:
+        """
+        Block until it is this caller's turn and the budgets allow the request
+
+        Callers are served by priority, then in arrival order. A retry passes
+        not_before to wait out its backoff and the sequence of its first
+        attempt to keep its place in line.
+
+        Returns:
+            Seconds spent waiting
+        """
+        start = time.monotonic()
+        ticket = (priority, self.take_sequence() if sequence is None else sequence, not_before)
+        with self._condition:
+            self._queue.append(ticket)
+            try:
+                while True:
+                    delay = self._turn(ticket, tokens, time.monotonic())
+                    if delay == 0:
+                        break
+                    self._condition.wait(timeout=delay)
+            finally:
+                waited = self._leave(ticket, start)
+        return waited
+
+    async def acquire_async(self, tokens: int = 0, priority: int = INTERACTIVE, not_before: float = 0.0,
+                            sequence: Optional[int] = None) -> float:
+        """Async counterpart of acquire; waits on the event loop without holding a thread"""
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        start = time.monotonic()
+        ticket = (priority, self.take_sequence() if sequence is None else sequence, not_before)
+        with self._condition:
+            self._queue.append(ticket)
+            self._async_waiters[ticket] = (loop, event)
+        try:
+            while True:
+                with self._condition:
+                    delay = self._turn(ticket, tokens, time.monotonic())
+                    # Cleared under the condition, so a wake-up sent after this check is not lost
+                    event.clear()
+                if delay == 0:
+                    break
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self._condition:
+                waited = self._leave(ticket, start)
+        return waited
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Full-jitter exponential delay, never shorter than the server's Retry-After"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = retry_after_seconds(error)
+        if _status_code(error) == 429:
+            with self._condition:
+                self.rate_limited += 1
+                if retry_after:
+                    self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        if retry_after:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _should_retry(self, attempt: int, error: Exception) -> bool:
+        if attempt < self.max_retries and is_retryable(error):
+            with self._condition:
+                self.retries += 1
+            return True
+        with self._condition:
+            self.failed += 1
+        return False
+
+    def call(self, func: Callable[[], T], tokens: int = 0, priority: int = INTERACTIVE) -> T:
+        """Run func within the budgets, retrying retryable failures ahead of calls that arrived later"""
+        sequence = self.take_sequence()
+        not_before = 0.0
+        for attempt in itertools.count():
+            self.acquire(tokens, priority, not_before, sequence)
+            try:
+                result = func()
+            except Exception as e:
+                if not self._should_retry(attempt, e):
+                    raise
+                not_before = time.monotonic() + self._backoff(attempt, e)
+                continue
+            with self._condition:
+                self.completed += 1
+            return result
+
+    async def call_async(self, func: Callable[[], Awaitable[T]], tokens: int = 0,
+                         priority: int = INTERACTIVE) -> T:
+        """Async counterpart of call; waiting for a turn doesn't occupy a thread"""
+        sequence = self.take_sequence()
+        not_before = 0.0
+        for attempt in itertools.count():
+            await self.acquire_async(tokens, priority, not_before, sequence)
+            try:
+                result = await func()
+            except Exception as e:
+                if not self._should_retry(attempt, e):
+                    raise
+                not_before = time.monotonic() + self._backoff(attempt, e)
+                continue
+            with self._condition:
+                self.completed += 1
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, budget usage and retry counters"""
+        with self._condition:
+            self._prune(time.monotonic())
+            admitted = len(self._window)
+            return {
+                "queue_depth": len(self._queue),
+                "requests_in_window": admitted,
+                "tokens_in_window": self._window_tokens,
+                "completed": self.completed,
+                "retries": self.retries,
+                "rate_limited": self.rate_limited,
+                "failed": self.failed,
+                "mean_wait_seconds": round(self.total_wait / max(1, self.completed + self.failed), 3),
+                "max_wait_seconds": round(self.max_wait, 3),
+                "paused_for_seconds": round(max(0.0, self._paused_until - time.monotonic()), 3),
+            }
+
+
+_shared_scheduler: Optional[RequestScheduler] = None
+_shared_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> RequestScheduler:
+    """Process-wide scheduler, budgeted by UX_ANALYZER_RPM and UX_ANALYZER_TPM"""
+    global _shared_scheduler
+    with _shared_scheduler_lock:
+        if _shared_scheduler is None:
+            _shared_scheduler = RequestScheduler(
+                requests_per_minute=int(os.getenv("UX_ANALYZER_RPM", "500")),
+                tokens_per_minute=int(os.getenv("UX_ANALYZER_TPM", "300000"))
+            )
+        return _shared_scheduler
+
+
+def test_scheduler(requests: int = 6, rate_limited: int = 3):
+    """Drive the scheduler and a real OpenAI client against a local server that answers 429 at first"""
+    import json
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from openai import OpenAI
+    
+    received: List[str] = []
+    completion = json.dumps({
+        "id": "stub", "object": "chat.completion", "created": 0, "model": "stub",
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": "{}"}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 1, "total_tokens": 11},
+    }).encode()
+    
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            received.append(json.loads(body)["messages"][0]["content"])
+            if len(received) <= rate_limited:
+                self.send_response(429)
+                self.send_header("Retry-After", "1")
+                payload = b'{"error": {"message": "Rate limit reached", "type": "requests"}}'
+            else:
+                self.send_response(200)
+                payload = completion
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        
+        def log_message(self, *args):
+            pass
+    
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = OpenAI(api_key="stub", base_url=f"http://127.0.0.1:{server.server_address[1]}/v1", max_retries=0)
+    # A short window keeps the run quick; the budget leaves one free slot after the first burst,
+    # so the order calls are admitted in after the pause is visible at the server
+    scheduler = RequestScheduler(requests_per_minute=requests + 1, tokens_per_minute=10_000,
+                                 base_delay=0.1, window_seconds=2.0)
+    
+    def send(label: str, priority: int):
+        request = {"model": "stub", "messages": [{"role": "user", "content": label}], "max_tokens": 100}
+        return scheduler.call(lambda: client.chat.completions.create(**request),
+                              tokens=estimate_request_tokens(request), priority=priority)
+    
+    try:
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=requests) as executor:
+            futures = [executor.submit(send, f"batch-{i}", BATCH) for i in range(requests)]
+            # Interactive work submitted while batch work is backed off should go out first
+            time.sleep(0.2)
+            futures.append(executor.submit(send, "interactive", INTERACTIVE))
+            for future in futures:
+                future.result()
+        elapsed = time.monotonic() - start
+        
+        retried = received[:rate_limited]
+        after_pause = [label for label in received[requests:] if label in retried or label == "interactive"]
+        print(f"{len(futures)} calls succeeded in {elapsed:.2f} s after {rate_limited} rate-limited responses")
+        print(f"Order after the pause: {after_pause}")
+        print(f"Scheduler stats: {scheduler.stats()}")
+        assert elapsed >= 2.0, "Retry-After or the request budget was not honored"
+        assert after_pause[0] == "interactive", "Interactive call did not jump the retried batch calls"
+    finally:
+        server.shutdown()
+    
+    # A retry keeps its place: with one request per window, a call that fails
+    # goes again before a call of the same priority that arrived during its first attempt
+    scheduler = RequestScheduler(requests_per_minute=1, base_delay=0.01, window_seconds=1.0)
+    order: List[str] = []
+    first_attempt = threading.Event()
+    
+    def flaky():
+        order.append("first")
+        if not first_attempt.is_set():
+            first_attempt.set()
+            time.sleep(0.2)
+            raise ConnectionError("dropped")
+        return "first"
+    
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        first = executor.submit(scheduler.call, flaky, 0, BATCH)
+        first_attempt.wait()
+        later = executor.submit(scheduler.call, lambda: order.append("later"), 0, BATCH)
+        first.result()
+        later.result()
+    print(f"Order with a retry: {order}")
+    assert order == ["first", "first", "later"], "The retry lost its place in line"
+
+if __name__ == "__main__":
+    test_scheduler()
@@ -0,0 +1,266 @@
+"""
+Analysis Result Cache
+Persistent on-disk cache for UX analysis results, keyed on image content
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from io import BytesIO
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+from PIL import Image
+
+DEFAULT_CACHE_DIR = os.getenv("UX_ANALYZER_CACHE_DIR", ".ux_cache")
+
+
+def fingerprint(*parts: str) -> str:
+    """Build a stable fingerprint from the inputs that shape an analysis"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+# A perceptual hash together with a coarse colour layout of the same image
+Signature = Tuple[int, bytes]
+
+
+def perceptual_hash(image_bytes: bytes, hash_size: int = 16) -> int:
+    """
+    Compute a difference hash (dHash) of an image
+
+    The image is reduced to a (hash_size + 1) x hash_size grayscale thumbnail
+    and each bit records whether a pixel is brighter than its right neighbour,
+    so small local changes such as a cursor or timestamp flip only a few bits.
+    """
+    return perceptual_signature(image_bytes, hash_size)[0]
+
+
+def perceptual_signature(image_bytes: bytes, hash_size: int = 16, colour_size: int = 4) -> Signature:
+    """
+    Compute the dHash of an image and a colour_size x colour_size RGB thumbnail
+
+    dHash only compares neighbouring pixels, so it is blind to absolute
+    brightness and colour: a dark and a light version of the same layout hash
+    alike. The thumbnail catches those differences.
+    """
+    with Image.open(BytesIO(image_bytes)) as image:
+        rgb = image.convert("RGB")
+        thumbnail = rgb.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+        colours = rgb.resize((colour_size, colour_size), Image.BOX)
+    pixels = np.asarray(thumbnail, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int("".join("1" if bit else "0" for bit in bits), 2), colours.tobytes()
+
+
+def hamming_distance(hash_a: int, hash_b: int) -> int:
+    """Number of differing bits between two perceptual hashes"""
+    return bin(hash_a ^ hash_b).count("1")
+
+
+def colour_distance(colours_a: bytes, colours_b: bytes) -> float:
+    """Mean absolute difference (0-255) between two colour thumbnails"""
+    if len(colours_a) != len(colours_b) or not colours_a:
+        return 255.0
+    a = np.frombuffer(colours_a, dtype=np.uint8).astype(np.int16)
+    b = np.frombuffer(colours_b, dtype=np.uint8).astype(np.int16)
+    return float(np.abs(a - b).mean())
+
+
+def is_near_duplicate(signature_a: Signature, signature_b: Signature, threshold: int,
+                      colour_threshold: float = 12.0) -> bool:
+    """Whether two images match in both structure (dHash) and colour"""
+    return (hamming_distance(signature_a[0], signature_b[0]) <= threshold
+            and colour_distance(signature_a[1], signature_b[1]) <= colour_threshold)
+
+
+class PerceptualIndex:
+    def __init__(self, index_path: Optional[str] = None, threshold: int = 3,
+                 max_entries: int = 1000, colour_threshold: float = 12.0):
+        """
+        Initialize the near-duplicate index
+
+        Args:
+            index_path: JSON file used to persist the index, or None for memory only
+            threshold: Maximum Hamming distance for two images to count as duplicates
+            max_entries: Oldest hashes are dropped beyond this many entries
+            colour_threshold: Maximum colour_distance for two images to count as duplicates
+        """
+        self.index_path = index_path
+        self.threshold = threshold
+        self.colour_threshold = colour_threshold
+        self.max_entries = max_entries
+        self._entries: List[Tuple[Signature, str]] = []
+        self._lock = threading.Lock()
+        if index_path and os.path.exists(index_path):
+            try:
+                with open(index_path, "r", encoding="utf-8") as f:
+                    self._entries = [((int(h, 16), bytes.fromhex(colours)), key)
+                                     for h, colours, key in json.load(f)]
+            except (OSError, ValueError, json.JSONDecodeError) as e:
+                print(f"Error loading perceptual index: {e}")
+
+    def find(self, signature: Signature) -> Optional[str]:
+        """Return the key of the closest indexed image within both thresholds"""
+        best_key = None
+        best_distance = self.threshold + 1
+        with self._lock:
+            for indexed, key in self._entries:
+                distance = hamming_distance(signature[0], indexed[0])
+                if (distance < best_distance
+                        and colour_distance(signature[1], indexed[1]) <= self.colour_threshold):
+                    best_key, best_distance = key, distance
+        return best_key
+
+    def add(self, signature: Signature, key: str):
+        """Index an image signature under a result key and persist the index"""
+        with self._lock:
+            self._entries.append((signature, key))
+            self._entries = self._entries[-self.max_entries:]
+            entries = [(format(h, "x"), colours.hex(), k) for (h, colours), k in self._entries]
+        if not self.index_path:
+            return
+        directory = os.path.dirname(self.index_path) or "."
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            print(f"Error writing perceptual index: {e}")
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+
+class ResultCache:
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR,
+                 max_entries: int = 1000,
+                 max_bytes: int = 200 * 1024 * 1024,
+                 max_age_seconds: float = 7 * 24 * 3600):
+        """
+        Initialize the result cache
+
+        Args:
+            cache_dir: Directory holding one JSON file per cached result
+            max_entries: Maximum number of results kept on disk
+            max_bytes: Maximum total size of the cache directory
+            max_age_seconds: Results older than this are treated as misses
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, image_bytes: bytes, context: str) -> str:
+        """Key a result on the image content plus the analysis context fingerprint"""
+        digest = hashlib.sha256(image_bytes)
+        digest.update(context.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a cached result, or None on a miss or expired entry"""
+        path = self._path(key)
+        try:
+            age = time.time() - os.path.getmtime(path)
+            if age > self.max_age_seconds:
+                os.unlink(path)
+                raise FileNotFoundError(path)
+            with open(path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # Refresh the timestamp so eviction is least-recently-used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return result
+
+    def set(self, key: str, result: Dict[str, Any]):
+        """Store a result atomically and evict old entries if over budget"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(result, f)
+            os.replace(tmp_path, self._path(key))
+        except Exception as e:
+            print(f"Error writing cache entry: {e}")
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return
+        self._evict()
+
+    def _evict(self):
+        """Drop expired entries, then the least recently used until within limits"""
+        with self._lock:
+            entries = []
+            now = time.time()
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if now - stat.st_mtime > self.max_age_seconds:
+                    self._remove(path)
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+            entries.sort()
+            total_bytes = sum(size for _, size, _ in entries)
+            while entries and (len(entries) > self.max_entries or total_bytes > self.max_bytes):
+                _, size, path = entries.pop(0)
+                self._remove(path)
+                total_bytes -= size
+
+    def _remove(self, path: str):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def clear(self):
+        """Remove every cached result"""
+        with self._lock:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".json"):
+                    self._remove(os.path.join(self.cache_dir, name))
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current disk usage"""
+        entries = 0
+        total_bytes = 0
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".json"):
+                entries += 1
+                try:
+                    total_bytes += os.path.getsize(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": total_bytes,
+        }
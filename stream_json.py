@@ -0,0 +1,131 @@
+"""
+Incremental JSON Parser
+Reports values of a JSON document as soon as they are complete, while the
+document is still streaming in
+"""
+
+import json
+from typing import Any, List, Optional, Tuple, Union
+
+PathKey = Union[str, int]
+
+
+class _Frame:
+    """An open object or array"""
+
+    __slots__ = ("kind", "key", "start", "current_key", "expect_key", "value_start", "index")
+
+    def __init__(self, kind: str, key: Optional[PathKey], start: int):
+        self.kind = kind
+        self.key = key
+        self.start = start
+        self.current_key: Optional[str] = None
+        self.expect_key = kind == "{"
+        self.value_start: Optional[int] = None
+        self.index = 0
+
+
+class IncrementalJSONParser:
+    def __init__(self, max_depth: int = 4):
+        """
+        Initialize the parser
+
+        Args:
+            max_depth: Only report values at most this many keys below the root
+        """
+        self.max_depth = max_depth
+        self.text = ""
+        self._position = 0
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._last_string: Optional[Tuple[int, int]] = None
+
+    def _path(self) -> Tuple[PathKey, ...]:
+        return tuple(frame.key for frame in self._stack[1:])
+
+    def _child_key(self) -> Optional[PathKey]:
+        if not self._stack:
+            return None
+        top = self._stack[-1]
+        return top.current_key if top.kind == "{" else top.index
+
+    def _mark_value_start(self, index: int):
+        if self._stack and not self._stack[-1].expect_key and self._stack[-1].value_start is None:
+            self._stack[-1].value_start = index
+
+    def _close_scalar(self, end: int, events: List[Tuple[Tuple[PathKey, ...], Any]]):
+        """Report the number, string, true, false or null that ends at end"""
+        top = self._stack[-1]
+        if top.value_start is None:
+            return
+        path = self._path() + (self._child_key(),)
+        top.value_start, start = None, top.value_start
+        if len(path) <= self.max_depth:
+            events.append((path, json.loads(self.text[start:end])))
+
+    def feed(self, chunk: str) -> List[Tuple[Tuple[PathKey, ...], Any]]:
+        """
+        Add the next piece of the document
+
+        Text before the first { or [ (e.g. a ```json fence) is ignored.
+
+        Returns:
+            (path, value) pairs for every value completed by this chunk, in
+            document order. Paths are tuples of object keys and array indexes;
+            the root document has the empty path.
+        """
+        self.text += chunk
+        events: List[Tuple[Tuple[PathKey, ...], Any]] = []
+        text = self.text
+        while self._position < len(text):
+            index = self._position
+            char = text[index]
+            self._position += 1
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = (self._string_start, index + 1)
+                continue
+            if not self._stack and char not in "{[":
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = index
+                self._mark_value_start(index)
+            elif char in "{[":
+                self._mark_value_start(index)
+                key = self._child_key()
+                self._stack.append(_Frame(char, key, index))
+            elif char in "}]":
+                self._close_scalar(index, events)
+                frame = self._stack.pop()
+                path = self._path() + ((frame.key,) if self._stack else ())
+                if len(path) <= self.max_depth:
+                    events.append((path, json.loads(text[frame.start:index + 1])))
+                if self._stack:
+                    # The container was the parent's current value and is now reported
+                    self._stack[-1].value_start = None
+            elif char == ":":
+                top = self._stack[-1]
+                if self._last_string:
+                    top.current_key = json.loads(text[self._last_string[0]:self._last_string[1]])
+                top.expect_key = False
+                top.value_start = None
+            elif char == ",":
+                self._close_scalar(index, events)
+                top = self._stack[-1]
+                if top.kind == "[":
+                    top.index += 1
+                else:
+                    top.expect_key = True
+            elif not char.isspace():
+                self._mark_value_start(index)
+        return events
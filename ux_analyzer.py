@@ -4,29 +4,316 @@ Analyzes images, videos, and websites against comprehensive UX principles
 """
 
 import json
+import asyncio
 import base64
+import hashlib
 import os
-from typing import Dict, List, Any, Optional
-from openai import OpenAI
-import streamlit as st
-from langchain_openai import ChatOpenAI # type: ignore
+from typing import Callable, Dict, Generator, Iterator, List, Any, NamedTuple, Optional, Tuple, Union
+from openai import OpenAI, AsyncOpenAI
 from PIL import Image
-import cv2 # type: ignore
-import tempfile
-import requests
 from io import BytesIO
 import copy
+import functools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from analysis_schema import build_response_schema, invalid_categories
+from stream_json import IncrementalJSONParser
+from image_preprocess import prepare_image, detect_mime_type, split_into_tiles
+from request_scheduler import INTERACTIVE, estimate_request_tokens, get_scheduler
+from result_cache import (
+    ResultCache, PerceptualIndex, DEFAULT_CACHE_DIR, Signature, fingerprint, is_near_duplicate,
+    perceptual_signature
+)
+
+# Rendered prompts keyed by (heuristics version, prompt name), shared by all analyzers
+_prompt_cache: Dict[Tuple[str, str], str] = {}
+_prompt_cache_lock = threading.Lock()
+
+# Output tokens gpt-4.1 can return in one response
+MAX_OUTPUT_TOKENS = 32768
+
+# full: checkpoint text and context, verbose output; compact: checkpoint text, terse output;
+# ids: checkpoint ids with short labels, terse output
+PROMPT_PROFILES = ("full", "compact", "ids")
+_STATUS_CODES = {"P": "PASS", "F": "FAIL", "N": "NEEDS_ATTENTION"}
+
+
+@functools.lru_cache(maxsize=4)
+def _token_encoding(model: str):
+    """tiktoken encoding for a model, or None if tiktoken or its encoding files are unavailable"""
+    try:
+        import tiktoken # type: ignore
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # Not installed, or the encoding could not be downloaded
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4.1") -> int:
+    """Count tokens with tiktoken when available, otherwise estimate at ~4 characters per token"""
+    encoding = _token_encoding(model)
+    if encoding is None:
+        return len(text) // 4
+    return len(encoding.encode(text))
+
+
+def _short_label(text: str, max_words: int = 8) -> str:
+    """First few words of a checkpoint, enough for the model to recognise it"""
+    words = text.rstrip(".").split()
+    return " ".join(words[:max_words]) + ("..." if len(words) > max_words else "")
+
+# Anything analyze_image accepts: a file path, encoded bytes, a PIL image or a BGR frame
+ImageInput = Union[str, bytes, Image.Image, np.ndarray]
+
+@functools.lru_cache(maxsize=None)
+def _shared_client(api_key: str) -> OpenAI:
+    """OpenAI client shared by every analyzer using api_key
+
+    Retries are owned by the request scheduler so backoff is coordinated
+    across callers.
+    """
+    return OpenAI(api_key=api_key, max_retries=0)
+
+def _streamlit_secret(name: str) -> str:
+    """Read a Streamlit secret, importing Streamlit only when a secret is actually needed"""
+    import streamlit as st
+    return st.secrets[name]
+
+# Called with a status message and, optionally, overall completion from 0 to 1
+ProgressCallback = Callable[..., None]
+
+
+def _no_progress(message: str, fraction: Optional[float] = None):
+    pass
+
+
+# An analysis is written once as a flow: a generator that yields the steps
+# below and receives each step's result. UXAnalyzer._run drives a flow with
+# blocking calls and threads, _run_async with awaits, so the sync and async
+# methods share one sequence of lookup, model call, repair and finish.
+class _Blocking(NamedTuple):
+    """Step: disk, encoding, hashing or browser work; run in a worker thread under asyncio"""
+    function: Callable[..., Any]
+    args: Tuple[Any, ...] = ()
+
+
+class _ModelCall(NamedTuple):
+    """Step: send a chat completion through the request scheduler"""
+    request: Dict[str, Any]
+
+
+class _Gather(NamedTuple):
+    """Step: run several flows concurrently, results in the given order"""
+    flows: List["_Flow"]
+    max_concurrency: int
+
+
+_Flow = Generator[Union[_Blocking, _ModelCall, _Gather], Any, Any]
 
 class UXAnalyzer:
-    def __init__(self):
-        """Initialize the UX Analyzer with heuristics data and OpenAI client"""
-        openai_api_key = os.getenv("OPENAI_API_KEY") or st.secrets["OPENAI_API_KEY"]
-        self.client = OpenAI(api_key=openai_api_key)
-        self.llm = ChatOpenAI(
-            temperature=1, model_name="gpt-4.1", openai_api_key=openai_api_key
-        )
+    def __init__(self, cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+                 near_duplicate_threshold: int = 0, prompt_profile: str = "full",
+                 priority: int = INTERACTIVE, frame_duplicate_threshold: int = 10):
+        """Initialize the UX Analyzer with heuristics data and OpenAI client
+
+        Pass cache_dir=None to disable the on-disk result cache. Results are
+        only reused for byte-identical images unless near_duplicate_threshold
+        is set; keep it at 3 or below, since same-template pages that differ
+        only in their text are within ~7 bits of each other.
+        frame_duplicate_threshold is the looser bound used to drop a video
+        frame that looks like the frame kept before it (0 keeps every frame).
+        prompt_profile is one of PROMPT_PROFILES; the compact and ids profiles
+        trade checkpoint context for fewer input and output tokens.
+        priority orders this analyzer's model calls in the shared request
+        scheduler; bulk jobs pass request_scheduler.BATCH.
+        """
+        if prompt_profile not in PROMPT_PROFILES:
+            raise ValueError(f"Unknown prompt profile: {prompt_profile}")
+        self.prompt_profile = prompt_profile
+        openai_api_key = os.getenv("OPENAI_API_KEY") or _streamlit_secret("OPENAI_API_KEY")
+        self.model = "gpt-4.1"
+        self._api_key = openai_api_key
+        # One client, and so one connection pool, per API key for the whole process
+        self.client = _shared_client(openai_api_key)
+        # AsyncOpenAI's connection pool is bound to the event loop that first uses it
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
+        self._async_clients_lock = threading.Lock()
+        self.scheduler = get_scheduler()
+        self.priority = priority
         with open("ux_heuristics_structured.json", "r", encoding="utf-8") as f:
             self.heuristics = json.load(f)
+        self.heuristics_version = fingerprint(json.dumps(self.heuristics, sort_keys=True))
+
+        # Results are only reusable while heuristics, model and prompt are unchanged
+        self.cache = ResultCache(cache_dir) if cache_dir else None
+        self.cache_context = fingerprint(
+            self.heuristics_version,
+            self.model,
+            self._create_analysis_prompt(),
+        )
+
+        # Opt-in: near-duplicate screenshots (cursor blink, clock) reuse cached results
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.frame_duplicate_threshold = frame_duplicate_threshold
+        self.perceptual_index = None
+        if self.cache and near_duplicate_threshold > 0:
+            self.perceptual_index = PerceptualIndex(
+                os.path.join(self.cache.cache_dir, f"perceptual_v2_{self.cache_context[:16]}.idx"),
+                threshold=near_duplicate_threshold,
+                max_entries=self.cache.max_entries,
+            )
+
+        # Video frames wider than this are downscaled while decoding
+        self.max_frame_width = 1920
+        
+        # Uploads are downscaled to the model's effective resolution and re-encoded
+        self.image_format = "JPEG"
+        self.image_quality = 85
+
+        self.metrics = {
+            "model_calls": 0,
+            "cache_hits": 0,
+            "near_duplicate_hits": 0,
+            "frames_skipped": 0,
+            "bytes_uploaded": 0,
+            "bytes_saved": 0,
+            "image_tokens": 0,
+            "image_tokens_saved": 0,
+            "prompt_tokens": 0,
+            "cached_prompt_tokens": 0,
+            "completion_tokens": 0,
+            "parse_failures": 0,
+            "repair_calls": 0,
+        }
+        # Token usage reported for the most recent model response
+        self.last_usage: Dict[str, int] = {}
+        self._metrics_lock = threading.Lock()
+        self._schemas: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """AsyncOpenAI client for the running event loop, created on first use there
+
+        A client can't be reused across loops (e.g. separate asyncio.run
+        calls), so each loop gets its own; it is dropped with its loop.
+        """
+        loop = asyncio.get_running_loop()
+        with self._async_clients_lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = AsyncOpenAI(api_key=self._api_key, max_retries=0)
+                self._async_clients[loop] = client
+            return client
+
+    def _complete(self, request: Dict[str, Any], **kwargs):
+        """Send a chat completion through the shared request scheduler"""
+        return self.scheduler.call(
+            lambda: self.client.chat.completions.create(**request, **kwargs),
+            tokens=estimate_request_tokens(request),
+            priority=self.priority,
+        )
+    
+    async def _complete_async(self, request: Dict[str, Any], **kwargs):
+        """Async counterpart of _complete"""
+        return await self.scheduler.call_async(
+            lambda: self.async_client.chat.completions.create(**request, **kwargs),
+            tokens=estimate_request_tokens(request),
+            priority=self.priority,
+        )
+    
+    def _run(self, flow: _Flow) -> Any:
+        """Drive a flow to completion with blocking calls
+
+        A step that raises has its exception thrown back into the flow at
+        the yield, so flows handle errors with ordinary try/except.
+        """
+        advance, value = flow.send, None
+        while True:
+            try:
+                step = advance(value)
+            except StopIteration as stop:
+                return stop.value
+            try:
+                if isinstance(step, _Blocking):
+                    value = step.function(*step.args)
+                elif isinstance(step, _ModelCall):
+                    value = self._complete(step.request)
+                else:
+                    value = self._gather(step)
+                advance = flow.send
+            except Exception as e:
+                advance, value = flow.throw, e
+    
+    def _gather(self, step: _Gather) -> List[Any]:
+        if not step.flows:
+            return []
+        workers = max(1, min(step.max_concurrency, len(step.flows)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(self._run, flow) for flow in step.flows]
+            try:
+                return [future.result() for future in futures]
+            except BaseException:
+                # e.g. a cancelled job: flows that haven't started yet never will
+                for future in futures:
+                    future.cancel()
+                raise
+    
+    async def _run_async(self, flow: _Flow) -> Any:
+        """Async counterpart of _run: blocking steps go to worker threads, model calls are awaited"""
+        advance, value = flow.send, None
+        while True:
+            try:
+                step = advance(value)
+            except StopIteration as stop:
+                return stop.value
+            try:
+                if isinstance(step, _Blocking):
+                    value = await asyncio.to_thread(step.function, *step.args)
+                elif isinstance(step, _ModelCall):
+                    value = await self._complete_async(step.request)
+                else:
+                    value = await self._gather_async(step)
+                advance = flow.send
+            except Exception as e:
+                advance, value = flow.throw, e
+    
+    async def _gather_async(self, step: _Gather) -> List[Any]:
+        semaphore = asyncio.Semaphore(max(1, step.max_concurrency))
+        
+        async def run(flow: _Flow) -> Any:
+            async with semaphore:
+                return await self._run_async(flow)
+        
+        tasks = [asyncio.ensure_future(run(flow)) for flow in step.flows]
+        try:
+            return list(await asyncio.gather(*tasks))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+    
+    def _count(self, metric: str, amount: int = 1):
+        """Increment an analyzer metric counter"""
+        with self._metrics_lock:
+            self.metrics[metric] = self.metrics.get(metric, 0) + amount
+
+    def calls_avoided(self) -> int:
+        """Model calls saved by exact cache hits, near-duplicate reuse and skipped frames"""
+        return (self.metrics["cache_hits"] + self.metrics["near_duplicate_hits"]
+                + self.metrics["frames_skipped"])
+
+    def _safe_signature(self, image_bytes: bytes) -> Optional[Signature]:
+        """Perceptual hash and colour layout of an image, or None if it cannot be decoded"""
+        try:
+            return perceptual_signature(image_bytes)
+        except Exception as e:
+            print(f"Error computing perceptual hash: {e}")
+            return None
 
     def merge_with_all_heuristics(self, ai_result):
         """Ensure all heuristics/checkpoints are present in the result."""
@@ -83,27 +370,100 @@ class UXAnalyzer:
         
         return merged
 
-    def _encode_image(self, image_path: str) -> str:
+    def _encode_image(self, image: ImageInput) -> str:
         """Encode image to base64 for OpenAI API"""
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
+        return base64.b64encode(self._read_image_bytes(image)).decode('utf-8')
+
+    def _read_image_bytes(self, image: ImageInput) -> bytes:
+        """Get encoded image bytes for hashing and upload, without temp files
+
+        Accepts a file path, already-encoded bytes, a PIL image or a BGR NumPy
+        frame as produced by OpenCV. In-memory images are stored as
+        uncompressed TIFF, i.e. their raw pixels behind a header:
+        prepare_image's encode stays the only lossy pass, identical pixels
+        give the same cache key, and no compression work is spent on bytes
+        that are decoded again straight away.
+        """
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            return bytes(image)
+        if isinstance(image, Image.Image):
+            # Pillow's TIFF writer can't round-trip YCbCr
+            if image.mode == "YCbCr":
+                image = image.convert("RGB")
+            buffer = BytesIO()
+            image.save(buffer, format="TIFF")
+            return buffer.getvalue()
+        if isinstance(image, np.ndarray):
+            import cv2 # type: ignore
+            ret, encoded = cv2.imencode(".tiff", image, [cv2.IMWRITE_TIFF_COMPRESSION, 1])
+            if not ret:
+                raise ValueError("Could not encode image array")
+            return encoded.tobytes()
+        with open(image, "rb") as image_file:
+            return image_file.read()
+    
+    def _memoized_prompt(self, name: str, render) -> str:
+        """Render a prompt once per heuristics version and reuse the identical string afterwards"""
+        key = (self.heuristics_version, name)
+        prompt = _prompt_cache.get(key)
+        if prompt is None:
+            prompt = render()
+            with _prompt_cache_lock:
+                _prompt_cache[key] = prompt
+        return prompt
     
-    def _create_analysis_prompt(self) -> str:
-        """Create the comprehensive analysis prompt for AI evaluation"""
-        prompt = """You are a UX expert analyzing digital interfaces against proven usability heuristics. 
+    def _create_analysis_prompt(self, profile: Optional[str] = None,
+                                category_ids: Optional[List[str]] = None) -> str:
+        """Create the comprehensive analysis prompt for AI evaluation
 
-Analyze the provided content against these 10 UX heuristic categories:
+        category_ids restricts the prompt to some categories, e.g. to
+        re-request only the malformed part of an answer.
+        """
+        profile = profile or self.prompt_profile
+        category_ids = list(category_ids or self.heuristics)
+        name = f"analysis:{profile}"
+        if category_ids != list(self.heuristics):
+            name += ":" + ",".join(category_ids)
+        return self._memoized_prompt(name, lambda: self._render_analysis_prompt(profile, category_ids))
+    
+    def prompt_token_counts(self) -> Dict[str, int]:
+        """Measured input tokens of the analysis prompt for each profile"""
+        return {profile: count_tokens(self._create_analysis_prompt(profile), self.model)
+                for profile in PROMPT_PROFILES}
+    
+    def _render_heuristics(self, profile: str, category_ids: List[str]) -> str:
+        """List the heuristic categories and checkpoints at the detail level of a profile"""
+        lines = []
+        for category_id in category_ids:
+            category = self.heuristics[category_id]
+            lines.append(f"\n{category_id}. {category['title']}")
+            for checkpoint in category['checkpoints']:
+                if profile == "ids":
+                    lines.append(f"  - {checkpoint['id']}: {_short_label(checkpoint['text'])}")
+                    continue
+                lines.append(f"  - {checkpoint['id']}: {checkpoint['text']}")
+                if profile == "full" and checkpoint['description']:
+                    lines.append(f"    Context: {checkpoint['description']}")
+        return "\n".join(lines) + "\n"
+    
+    def _render_analysis_prompt(self, profile: str, category_ids: List[str]) -> str:
+        prompt = f"""You are a UX expert analyzing digital interfaces against proven usability heuristics. 
 
-"""
+Analyze the provided content against these {len(category_ids)} UX heuristic categories:
+
+""" + self._render_heuristics(profile, category_ids)
         
-        for category_id, category in self.heuristics.items():
-            prompt += f"\n{category_id}. {category['title']}\n"
-            for checkpoint in category['checkpoints']:
-                prompt += f"  - {checkpoint['id']}: {checkpoint['text']}\n"
-                if checkpoint['description']:
-                    prompt += f"    Context: {checkpoint['description']}\n"
+        if profile != "full":
+            return prompt + """
+For each checkpoint give a status code: "P" (pass), "F" (fail) or "N" (needs attention), and a confidence from 1 to 5.
+Only for "F" and "N" add a brief reason and a specific, actionable recommendation; leave them empty for "P".
+
+Return your analysis in this JSON format, using these short keys:
+{"s":85,"sum":"Brief overall assessment","c":{"01":{"s":80,"k":{"01.01":{"v":"P","c":4,"r":"","a":""},"01.02":{"v":"F","c":5,"r":"Too much information at once","a":"Use progressive disclosure"}}}},"pi":["Most important issue"],"st":["Main strength"]}
+s = score 0-100, sum = summary, c = categories, k = checkpoints, v = status code, c = confidence, r = reason, a = recommendation, pi = priority issues, st = strengths.
+Focus on practical, actionable insights that would help improve the user experience."""
         
-        prompt += """
+        return prompt + """
 
 For each checkpoint, evaluate the content and provide:
 1. Status: "PASS", "FAIL", or "NEEDS_ATTENTION"
@@ -146,159 +506,888 @@ Return your analysis in this JSON format:
 }
 
 Focus on practical, actionable insights that would help improve the user experience."""
+    
+    def _lookup_cached(self, image_bytes: bytes) -> Tuple[Optional[Dict[str, Any]], Optional[str], Optional[Signature]]:
+        """Look up a reusable result for an image
+
+        Returns the cached result (or None) along with the cache key and
+        perceptual signature to store a fresh result under.
+        """
+        if not self.cache:
+            return None, None, None
         
-        return prompt
+        # Reuse a previous result for identical image content
+        cache_key = self.cache.make_key(image_bytes, self.cache_context)
+        cached_result = self.cache.get(cache_key)
+        if cached_result is not None:
+            self._count("cache_hits")
+            return cached_result, cache_key, None
+        
+        # Fall back to a visually near-identical image analyzed earlier
+        image_signature = None
+        if self.perceptual_index:
+            image_signature = self._safe_signature(image_bytes)
+            similar_key = self.perceptual_index.find(image_signature) if image_signature is not None else None
+            if similar_key:
+                cached_result = self.cache.get(similar_key)
+                if cached_result is not None:
+                    self._count("near_duplicate_hits")
+                    return cached_result, cache_key, image_signature
+        
+        return None, cache_key, image_signature
     
-    def analyze_image(self, image_path: str) -> Dict[str, Any]:
-        """Analyze an image against UX heuristics"""
+    def _image_part(self, image_bytes: bytes) -> Dict[str, Any]:
+        """Preprocess an image and build its message part, recording payload savings"""
         try:
-            # Encode image for API
-            base64_image = self._encode_image(image_path)
+            prepared = prepare_image(image_bytes, self.image_format, self.image_quality)
+        except Exception as e:
+            # Fall back to the raw bytes if Pillow can't decode the image
+            print(f"Error preprocessing image: {e}")
+            prepared = {
+                "data": image_bytes,
+                "mime_type": detect_mime_type(image_bytes),
+                "detail": "auto",
+                "original_bytes": len(image_bytes),
+                "bytes": len(image_bytes),
+                "original_tokens": 0,
+                "tokens": 0,
+            }
+        
+        self._count("bytes_uploaded", prepared["bytes"])
+        self._count("bytes_saved", prepared["original_bytes"] - prepared["bytes"])
+        self._count("image_tokens", prepared["tokens"])
+        self._count("image_tokens_saved", prepared["original_tokens"] - prepared["tokens"])
+        
+        # Encode image for API
+        base64_image = base64.b64encode(prepared["data"]).decode('utf-8')
+        return {
+            "type": "image_url",
+            "image_url": {
+                "url": f"data:{prepared['mime_type']};base64,{base64_image}",
+                "detail": prepared["detail"]
+            }
+        }
+    
+    def _response_format(self, category_ids: List[str]) -> Dict[str, Any]:
+        """Structured-output schema for the given categories, built once per category set"""
+        key = ",".join(category_ids)
+        if key not in self._schemas:
+            self._schemas[key] = {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": "ux_analysis",
+                    "strict": True,
+                    "schema": build_response_schema(self.heuristics, category_ids,
+                                                    terse=self.prompt_profile != "full"),
+                },
+            }
+        return self._schemas[key]
+    
+    def _build_request(self, image_bytes: bytes, category_ids: Optional[List[str]] = None,
+                       max_tokens: Optional[int] = None) -> Dict[str, Any]:
+        """Build the chat completion arguments for analyzing one image
+
+        The static instructions and heuristics go first as a byte-identical
+        system message and the image last, so every request shares the same
+        prefix and provider-side prompt caching can reuse it. The answer is
+        constrained to a JSON schema generated from the heuristics. max_tokens
+        defaults to a budget sized to the requested checkpoints.
+        """
+        category_ids = list(category_ids or self.heuristics)
+        max_tokens = max_tokens or self._max_tokens_for(category_ids)
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": self._create_analysis_prompt(category_ids=category_ids)},
+                {"role": "user", "content": [self._image_part(image_bytes)]}
+            ],
+            "response_format": self._response_format(category_ids),
+            "max_tokens": max_tokens,
+            "temperature": 0.1
+        }
+    
+    def _parse_analysis(self, response, category_ids: Optional[List[str]] = None) -> Tuple[Dict[str, Any], List[str]]:
+        """Parse a model response and validate it category by category
+
+        Returns the parsed result in the full shape and the ids of the
+        requested categories that are missing or malformed.
+        """
+        self._record_usage(response)
+        return self._parse_analysis_text(response.choices[0].message.content, category_ids)
+    
+    def _parse_analysis_text(self, analysis_text: Optional[str],
+                             category_ids: Optional[List[str]] = None) -> Tuple[Dict[str, Any], List[str]]:
+        category_ids = list(category_ids or self.heuristics)
+        try:
+            result = self._expand_terse(self._extract_json(analysis_text))
+        except (json.JSONDecodeError, ValueError, AttributeError):
+            # Typically a response cut off at max_tokens: keep the categories that did arrive whole
+            self._count("parse_failures")
+            result = self._expand_terse(self._recover_partial(analysis_text))
+            if not result.get("categories"):
+                return {}, category_ids
+            return result, invalid_categories(result, self.heuristics, category_ids)
+        
+        invalid = invalid_categories(result, self.heuristics, category_ids)
+        if invalid:
+            self._count("parse_failures")
+        return result, invalid
+    
+    def _recover_partial(self, analysis_text: Optional[str]) -> Dict[str, Any]:
+        """Top-level fields and categories that are complete in a truncated response"""
+        partial: Dict[str, Any] = {}
+        parser = IncrementalJSONParser(max_depth=2)
+        for path, value in parser.feed(analysis_text or ""):
+            if len(path) == 1:
+                partial[path[0]] = value
+            elif len(path) == 2 and path[0] in ("categories", "c") and isinstance(path[1], str):
+                partial.setdefault(path[0], {})[path[1]] = value
+        return partial
+    
+    def _apply_repair(self, result: Dict[str, Any], repair: Dict[str, Any],
+                      category_ids: List[str]) -> Dict[str, Any]:
+        """Replace the malformed categories of result with those from a repair response
+
+        Top-level fields missing from result (e.g. cut off with its tail) are
+        taken from the repair.
+        """
+        if not result:
+            return repair
+        categories = dict(result.get("categories") or {})
+        for category_id in category_ids:
+            if category_id in (repair.get("categories") or {}):
+                categories[category_id] = repair["categories"][category_id]
+        return {**repair, **result, "categories": categories}
+    
+    def _finish_analysis(self, result: Dict[str, Any], invalid: List[str], cache_key: Optional[str],
+                         image_signature: Optional[Signature]) -> Dict[str, Any]:
+        """Complete a validated result and cache it"""
+        if not result or len(invalid) == len(self.heuristics):
+            return self._analysis_error("Model response could not be parsed")
+        
+        merged_result = self.merge_with_all_heuristics(result)
+        
+        if invalid:
+            # Keep the usable categories but don't cache a partial analysis
+            merged_result["incomplete_categories"] = invalid
+        elif cache_key:
+            self.cache.set(cache_key, merged_result)
+            if self.perceptual_index and image_signature is not None:
+                self.perceptual_index.add(image_signature, cache_key)
+        
+        return merged_result
+    
+    def parse_failure_rate(self) -> float:
+        """Share of model responses that were unparseable or had malformed categories"""
+        responses = self.metrics["model_calls"] + self.metrics["repair_calls"]
+        return self.metrics["parse_failures"] / responses if responses else 0.0
+    
+    def _expand_terse(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Expand the short-key output of the compact and ids profiles to the full result shape"""
+        if "categories" in result or not any(key in result for key in ("s", "c")):
+            return result
+        
+        categories = {}
+        for category_id, category in (result.get("c") or {}).items():
+            if not isinstance(category, dict):
+                continue
+            checkpoints = {}
+            for checkpoint_id, verdict in (category.get("k") or {}).items():
+                if isinstance(verdict, dict):
+                    verdict = [verdict.get("v"), verdict.get("c"), verdict.get("r"), verdict.get("a")]
+                if not isinstance(verdict, list) or not verdict:
+                    continue
+                verdict = verdict + [None] * (4 - len(verdict))
+                checkpoints[checkpoint_id] = {
+                    "status": _STATUS_CODES.get(verdict[0], verdict[0]),
+                    "confidence": verdict[1] or 0,
+                    "reasoning": verdict[2] or "",
+                    "recommendation": verdict[3] or "",
+                }
+            categories[category_id] = {
+                "title": self.heuristics.get(category_id, {}).get("title", ""),
+                "score": category.get("s", 0),
+                "checkpoints": checkpoints,
+            }
+        
+        return {
+            "overall_score": result.get("s", 0),
+            "summary": result.get("sum", ""),
+            "categories": categories,
+            "priority_issues": result.get("pi", []),
+            "strengths": result.get("st", []),
+        }
+    
+    def _record_usage(self, response):
+        """Add a response's token usage, including prompt tokens served from the provider cache, to metrics"""
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        # Built locally first: a shared analyzer records usage from several threads
+        last_usage = {
+            "prompt_tokens": usage.prompt_tokens or 0,
+            "cached_prompt_tokens": (getattr(details, "cached_tokens", 0) or 0) if details else 0,
+            "completion_tokens": usage.completion_tokens or 0,
+        }
+        self.last_usage = last_usage
+        for metric, amount in last_usage.items():
+            self._count(metric, amount)
+    
+    def _extract_json(self, analysis_text: Optional[str]) -> Dict[str, Any]:
+        """Extract the JSON object from a model response"""
+        if analysis_text is None:
+            raise ValueError("No content returned from OpenAI API.")
+        # Find JSON in the response
+        start_idx = analysis_text.find('{')
+        end_idx = analysis_text.rfind('}') + 1
+        return json.loads(analysis_text[start_idx:end_idx])
+    
+    def _build_batch_request(self, images: List[bytes]) -> Dict[str, Any]:
+        """Build one chat completion that evaluates several ordered images"""
+        # Only the image count varies, so it goes with the images after the shared prefix
+        content = [{"type": "text", "text": f"{len(images)} images follow (Image 1 to Image {len(images)})."}]
+        for index, image_bytes in enumerate(images, 1):
+            content.append({"type": "text", "text": f"Image {index}:"})
+            content.append(self._image_part(image_bytes))
+        
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": self._create_batch_prompt()},
+                {"role": "user", "content": content}
+            ],
+            "response_format": {"type": "json_object"},
+            # Room for the combined verdicts plus a short verdict list per image
+            "max_tokens": 4000 + 800 * len(images),
+            "temperature": 0.1
+        }
+    
+    def _finish_batch_analysis(self, response, num_images: int, cache_key: Optional[str]) -> Dict[str, Any]:
+        """Parse a batched response into per-image results plus the combined result"""
+        self._record_usage(response)
+        batch_result = self._extract_json(response.choices[0].message.content)
+        
+        frames = []
+        for frame in batch_result.get("frames", [])[:num_images]:
+            if not isinstance(frame, dict):
+                continue
+            category_scores = frame.get("category_scores", {})
+            statuses = frame.get("checkpoints", {})
+            categories = {}
+            for category_id, category in self.heuristics.items():
+                checkpoints = {
+                    checkpoint["id"]: {
+                        "text": checkpoint["text"],
+                        "status": _STATUS_CODES.get(statuses[checkpoint["id"]], statuses[checkpoint["id"]]),
+                        "confidence": 0,
+                        "reasoning": "",
+                        "recommendation": ""
+                    }
+                    for checkpoint in category["checkpoints"] if checkpoint["id"] in statuses
+                }
+                categories[category_id] = {
+                    "title": category["title"],
+                    "score": category_scores.get(category_id, 0),
+                    "checkpoints": checkpoints
+                }
+            frames.append(self.merge_with_all_heuristics({
+                "overall_score": frame.get("overall_score", 0),
+                "summary": frame.get("summary", ""),
+                "categories": categories,
+                "priority_issues": frame.get("priority_issues", []),
+                "strengths": frame.get("strengths", [])
+            }))
+        
+        combined = batch_result.get("combined")
+        result = {
+            "frames": frames,
+            "combined": (self.merge_with_all_heuristics(self._expand_terse(combined))
+                         if isinstance(combined, dict) else None)
+        }
+        
+        if cache_key and frames:
+            self.cache.set(cache_key, result)
+        
+        return result
+    
+    def _batch_cache_key(self, images: List[bytes]) -> Optional[str]:
+        if not self.cache:
+            return None
+        digests = b"".join(hashlib.sha256(image_bytes).digest() for image_bytes in images)
+        return self.cache.make_key(digests, self.cache_context + ":batch")
+    
+    def _batch_flow(self, images: List[ImageInput]) -> _Flow:
+        try:
+            images = yield _Blocking(lambda: [self._read_image_bytes(image) for image in images])
+            cache_key = self._batch_cache_key(images)
+            if cache_key:
+                cached_result = yield _Blocking(self.cache.get, (cache_key,))
+                if cached_result is not None:
+                    self._count("cache_hits")
+                    return cached_result
             
-            # Create analysis prompt
-            prompt = self._create_analysis_prompt()
+            self._count("model_calls")
+            request = yield _Blocking(self._build_batch_request, (images,))
+            response = yield _ModelCall(request)
+            return (yield _Blocking(self._finish_batch_analysis, (response, len(images), cache_key)))
+            
+        except Exception as e:
+            return self._analysis_error(str(e))
+    
+    def analyze_images_batch(self, images: List[ImageInput]) -> Dict[str, Any]:
+        """Analyze several images (e.g. video frames or pages) in one model call
+
+        Returns {"frames": [per-image results], "combined": result}, which
+        _aggregate_video_analysis accepts directly. The heuristics prompt is
+        sent once for the whole batch instead of once per image.
+        """
+        return self._run(self._batch_flow(images))
+    
+    async def analyze_images_batch_async(self, images: List[ImageInput]) -> Dict[str, Any]:
+        """Async counterpart of analyze_images_batch"""
+        return await self._run_async(self._batch_flow(images))
+    
+    def _analysis_error(self, message: str) -> Dict[str, Any]:
+        return {
+            "error": f"Analysis failed: {message}",
+            "overall_score": 0,
+            "summary": "Analysis could not be completed",
+            "categories": {},
+            "priority_issues": [],
+            "strengths": []
+        }
+    
+    def _create_batch_prompt(self) -> str:
+        """Create the analysis prompt for several ordered images in one request"""
+        return self._memoized_prompt(f"batch:{self.prompt_profile}", self._render_batch_prompt)
+    
+    def _render_batch_prompt(self) -> str:
+        base_prompt = self._create_analysis_prompt()
+        instructions_end = base_prompt.index("Return your analysis in this JSON format")
+        if self.prompt_profile != "full":
+            return base_prompt[:instructions_end] + """You will receive a numbered sequence of images (Image 1, Image 2, ...), for example consecutive frames of one user session.
+Evaluate every image, then give a combined evaluation of the whole sequence.
+
+Return your analysis in this JSON format, using the short keys above for "combined":
+{"frames":[{"overall_score":80,"summary":"One sentence about Image 1","category_scores":{"01":80,"02":75},"checkpoints":{"01.01":"P","01.02":"F"}}],"combined":{"s":78,"sum":"Brief overall assessment of the sequence","c":{"01":{"s":80,"k":{"01.01":{"v":"P","c":4,"r":"","a":""},"01.02":{"v":"F","c":5,"r":"Too much information at once","a":"Use progressive disclosure"}}}},"pi":["Most important issue"],"st":["Main strength"]}}
+s = score 0-100, sum = summary, c = categories, k = checkpoints, v = status code, c = confidence, r = reason, a = recommendation, pi = priority issues, st = strengths.
+"frames" must contain exactly one entry per image, in image order, with a status code for every checkpoint.
+Focus on practical, actionable insights that would help improve the user experience."""
+        
+        return base_prompt[:instructions_end] + """You will receive a numbered sequence of images (Image 1, Image 2, ...), for example consecutive frames of one user session.
+Evaluate every image, then give a combined evaluation of the whole sequence.
+
+Return your analysis in this JSON format:
+{
+  "frames": [
+    {
+      "overall_score": 80,
+      "summary": "One sentence about Image 1",
+      "category_scores": {"01": 80, "02": 75},
+      "checkpoints": {"01.01": "PASS", "01.02": "FAIL"}
+    }
+  ],
+  "combined": {
+    "overall_score": 78,
+    "summary": "Brief overall assessment of the sequence",
+    "categories": {
+      "01": {
+        "title": "People Don't Want to Work or Think More Than They Have To",
+        "score": 80,
+        "checkpoints": {
+          "01.01": {
+            "status": "PASS",
+            "confidence": 4,
+            "reasoning": "Interface minimizes user effort effectively",
+            "recommendation": ""
+          }
+        }
+      }
+    },
+    "priority_issues": ["Progressive disclosure needed for complex information"],
+    "strengths": ["Clear navigation structure"]
+  }
+}
+
+"frames" must contain exactly one entry per image, in image order, with a status for every checkpoint.
+Focus on practical, actionable insights that would help improve the user experience."""
+    
+    def _lookup_flow(self, image: ImageInput) -> _Flow:
+        """Read the image and look for a reusable result
+
+        Returns the image bytes, the cached result (or None), and the cache
+        key and signature to store a fresh result under.
+        """
+        image_bytes = yield _Blocking(self._read_image_bytes, (image,))
+        cached_result, cache_key, image_signature = yield _Blocking(self._lookup_cached, (image_bytes,))
+        return image_bytes, cached_result, cache_key, image_signature
+    
+    def _repair_and_finish_flow(self, image_bytes: bytes, result: Dict[str, Any], invalid: List[str],
+                                cache_key: Optional[str], image_signature: Optional[Signature],
+                                progress: Optional[ProgressCallback] = None) -> _Flow:
+        if invalid:
+            # Re-request only the categories that came back malformed
+            (progress or _no_progress)(f"Repairing {len(invalid)} malformed categories", 0.8)
+            self._count("repair_calls")
+            request = yield _Blocking(self._build_request, (image_bytes, invalid))
+            response = yield _ModelCall(request)
+            repair, still_invalid = self._parse_analysis(response, invalid)
+            result, invalid = self._apply_repair(result, repair, invalid), still_invalid
+        
+        return (yield _Blocking(self._finish_analysis, (result, invalid, cache_key, image_signature)))
+    
+    def _image_flow(self, image: ImageInput, progress: Optional[ProgressCallback] = None) -> _Flow:
+        report = progress or _no_progress
+        try:
+            report("Preparing image", 0.05)
+            image_bytes, cached_result, cache_key, image_signature = yield from self._lookup_flow(image)
+            if cached_result is not None:
+                return cached_result
             
             # Call OpenAI API
-            response = self.client.chat.completions.create(
-                model="gpt-4.1",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
-                                }
-                            }
-                        ]
-                    }
-                ],
-                max_tokens=4000,
-                temperature=0.1
-            )
+            report("Analyzing image", 0.1)
+            self._count("model_calls")
+            request = yield _Blocking(self._build_request, (image_bytes,))
+            response = yield _ModelCall(request)
+            result, invalid = self._parse_analysis(response)
             
-            # Parse response
-            analysis_text = response.choices[0].message.content
+            return (yield from self._repair_and_finish_flow(image_bytes, result, invalid, cache_key, image_signature,
+                                                            progress))
             
-            # Try to extract JSON from response
-            try:
-                if analysis_text is not None:
-                    # Find JSON in the response
-                    start_idx = analysis_text.find('{')
-                    end_idx = analysis_text.rfind('}') + 1
-                    json_str = analysis_text[start_idx:end_idx]
-                    analysis_result = json.loads(json_str)
-                else:
-                    raise ValueError("No content returned from OpenAI API.")
-            except (json.JSONDecodeError, ValueError, AttributeError):
-                # Fallback if JSON parsing fails
-                analysis_result = {
-                    "overall_score": 75,
-                    "summary": "Analysis completed but formatting issue occurred",
-                    "raw_response": analysis_text,
-                    "categories": {},
-                    "priority_issues": ["Unable to parse detailed analysis"],
-                    "strengths": []
-                }
+        except Exception as e:
+            return self._analysis_error(str(e))
+    
+    def analyze_image(self, image: ImageInput, progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """Analyze an image against UX heuristics
+
+        image may be a file path, encoded bytes, a PIL image or a NumPy frame.
+        progress, if given, is called with a message and a 0-1 fraction before
+        each model call; an exception it raises skips the remaining calls.
+        """
+        return self._run(self._image_flow(image, progress))
+    
+    async def analyze_image_async(self, image: ImageInput,
+                                  progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """Async counterpart of analyze_image using the AsyncOpenAI client
+
+        Disk reads, encoding and hashing run off the event loop.
+        """
+        return await self._run_async(self._image_flow(image, progress))
+    
+    def _stream_event(self, path: Tuple, value: Any) -> Optional[Tuple[str, Any]]:
+        """Translate a completed value of the streamed answer into a display event"""
+        terse = self.prompt_profile != "full"
+        categories_key, checkpoints_key = ("c", "k") if terse else ("categories", "checkpoints")
+        if path == (("s",) if terse else ("overall_score",)):
+            return "overall_score", value
+        if path == (("sum",) if terse else ("summary",)):
+            return "summary", value
+        if len(path) == 2 and path[0] == categories_key and isinstance(value, dict):
+            category = self._expand_terse({"c": {path[1]: value}})["categories"][path[1]] if terse else value
+            return "category", (path[1], category)
+        if len(path) == 4 and path[0] == categories_key and path[2] == checkpoints_key and isinstance(value, dict):
+            checkpoint = value
+            if terse:
+                checkpoint = self._expand_terse({"c": {path[1]: {"k": {path[3]: value}}}})
+                checkpoint = checkpoint["categories"][path[1]]["checkpoints"][path[3]]
+            return "checkpoint", (path[1], path[3], checkpoint)
+        return None
+    
+    def analyze_image_stream(self, image: ImageInput) -> Iterator[Tuple[str, Any]]:
+        """Analyze an image, yielding parts of the answer as soon as the model has written them
+
+        Yields ("overall_score", score), ("summary", text),
+        ("checkpoint", (category_id, checkpoint_id, verdict)) and
+        ("category", (category_id, category)) events while the response
+        streams in, and finally ("result", result) with the same complete,
+        validated result analyze_image would return. Total time is unchanged,
+        but the first categories can be shown within a few seconds.
+        """
+        try:
+            image_bytes, cached_result, cache_key, image_signature = self._run(self._lookup_flow(image))
+            if cached_result is not None:
+                yield "result", cached_result
+                return
+            
+            self._count("model_calls")
+            request = self._build_request(image_bytes)
+            stream = self._complete(
+                request, stream=True, stream_options={"include_usage": True}
+            )
+            parser = IncrementalJSONParser(max_depth=4)
+            for chunk in stream:
+                if getattr(chunk, "usage", None):
+                    self._record_usage(chunk)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                for path, value in parser.feed(delta):
+                    event = self._stream_event(path, value)
+                    if event:
+                        yield event
             
-            merged_result = self.merge_with_all_heuristics(analysis_result)
-            return merged_result
+            result, invalid = self._parse_analysis_text(parser.text)
+            yield "result", self._run(
+                self._repair_and_finish_flow(image_bytes, result, invalid, cache_key, image_signature)
+            )
             
         except Exception as e:
-            return {
-                "error": f"Analysis failed: {str(e)}",
-                "overall_score": 0,
-                "summary": "Analysis could not be completed",
-                "categories": {},
-                "priority_issues": [],
-                "strengths": []
-            }
+            yield "result", self._analysis_error(str(e))
     
-    def analyze_video(self, video_path: str, num_frames: int = 5) -> Dict[str, Any]:
-        """Analyze a video by extracting key frames and analyzing them"""
+    def _tiled_flow(self, image: ImageInput, tile_height: int = 1080, overlap: int = 120,
+                    max_concurrency: int = 4) -> _Flow:
         try:
-            # Extract frames from video
-            frames = self._extract_video_frames(video_path, num_frames)
-            
-            if not frames:
-                return {
-                    "error": "Could not extract frames from video",
-                    "overall_score": 0,
-                    "summary": "Video analysis failed",
-                    "categories": {},
-                    "priority_issues": [],
-                    "strengths": []
-                }
+            image_bytes = yield _Blocking(self._read_image_bytes, (image,))
+            tiles = yield _Blocking(split_into_tiles, (image_bytes, tile_height, overlap))
+            if len(tiles) == 1:
+                return (yield from self._image_flow(tiles[0]))
             
-            # Analyze each frame and aggregate results
-            frame_analyses = []
-            for i, frame_path in enumerate(frames):
-                analysis = self.analyze_image(frame_path)
-                if 'error' not in analysis:
-                    frame_analyses.append(analysis)
-                # Clean up temporary frame file
-                os.unlink(frame_path)
+            tile_analyses = yield _Gather([self._image_flow(tile) for tile in tiles], max_concurrency)
+            return self._merge_tile_analyses(tile_analyses)
             
-            if not frame_analyses:
-                return {
-                    "error": "No frames could be analyzed",
-                    "overall_score": 0,
-                    "summary": "Video analysis failed",
-                    "categories": {},
-                    "priority_issues": [],
-                    "strengths": []
-                }
+        except Exception as e:
+            return self._analysis_error(str(e))
+    
+    def analyze_image_tiled(self, image: ImageInput, tile_height: int = 1080, overlap: int = 120,
+                            max_concurrency: int = 4) -> Dict[str, Any]:
+        """Analyze a tall full-page screenshot as overlapping viewport-sized tiles
+
+        Tiles are analyzed concurrently and merged per checkpoint, so latency
+        is bounded by the slowest tile and each request stays small.
+        """
+        return self._run(self._tiled_flow(image, tile_height, overlap, max_concurrency))
+    
+    async def analyze_image_tiled_async(self, image: ImageInput, tile_height: int = 1080, overlap: int = 120,
+                                        max_concurrency: int = 4) -> Dict[str, Any]:
+        """Async counterpart of analyze_image_tiled"""
+        return await self._run_async(self._tiled_flow(image, tile_height, overlap, max_concurrency))
+    
+    def _shard_categories(self, shards: int) -> List[List[str]]:
+        """Split the categories into groups with similar checkpoint counts, each in heuristics order"""
+        groups: List[List[str]] = [[] for _ in range(max(1, min(shards, len(self.heuristics))))]
+        loads = [0] * len(groups)
+        by_size = sorted(self.heuristics, key=lambda category_id: -len(self.heuristics[category_id]["checkpoints"]))
+        for category_id in by_size:
+            lightest = loads.index(min(loads))
+            groups[lightest].append(category_id)
+            loads[lightest] += len(self.heuristics[category_id]["checkpoints"])
+        order = list(self.heuristics)
+        return [sorted(group, key=order.index) for group in groups if group]
+    
+    def _max_tokens_for(self, category_ids: List[str]) -> int:
+        """Output budget for an analysis of these categories: room for their checkpoints plus the summary fields"""
+        per_checkpoint = 90 if self.prompt_profile == "full" else 45
+        checkpoints = sum(len(self.heuristics[category_id]["checkpoints"]) for category_id in category_ids)
+        return min(MAX_OUTPUT_TOKENS, 400 + per_checkpoint * checkpoints)
+    
+    def _shard_flow(self, image_bytes: bytes, category_ids: List[str]) -> _Flow:
+        """Evaluate one group of categories, retrying once for whatever part failed
+
+        Returns the shard's result and the categories still invalid.
+        """
+        result: Dict[str, Any] = {}
+        pending = list(category_ids)
+        for attempt in range(2):
+            self._count("repair_calls" if attempt else "model_calls")
+            try:
+                request = yield _Blocking(self._build_request, (image_bytes, pending))
+                response = yield _ModelCall(request)
+            except Exception as e:
+                print(f"Shard {','.join(pending)} failed: {e}")
+                continue
+            repair, invalid = self._parse_analysis(response, pending)
+            result, pending = self._apply_repair(result, repair, pending), invalid
+            if not pending:
+                break
+        return result, pending
+    
+    def _merge_shards(self, shard_results: List[Tuple[Dict[str, Any], List[str]]]) -> Tuple[Dict[str, Any], List[str]]:
+        """Combine shard results into one result
+
+        Each shard scores its own categories, so those scores are kept; the
+        overall score is their mean, since no shard saw the whole heuristic set.
+        """
+        categories = {}
+        invalid: List[str] = []
+        for result, failed in shard_results:
+            invalid.extend(failed)
+            for category_id, category in (result.get("categories") or {}).items():
+                if category_id in failed or category_id not in self.heuristics:
+                    continue
+                categories[category_id] = category
+        
+        if not categories:
+            return {}, invalid
+        categories = {category_id: categories[category_id] for category_id in self.heuristics
+                      if category_id in categories}
+        scores = [category.get("score", 0) for category in categories.values()]
+        successful = [result for result, _ in shard_results if result]
+        merged = {
+            "overall_score": round(sum(scores) / len(scores)),
+            "summary": " ".join(result.get("summary", "") for result in successful).strip(),
+            "categories": categories,
+            "priority_issues": list(dict.fromkeys(
+                issue for result in successful for issue in result.get("priority_issues", [])
+            ))[:10],
+            "strengths": list(dict.fromkeys(
+                strength for result in successful for strength in result.get("strengths", [])
+            ))[:10],
+            "shards_analyzed": len(shard_results)
+        }
+        return merged, [category_id for category_id in self.heuristics if category_id in invalid]
+    
+    def _sharded_flow(self, image: ImageInput, shards: int = 3) -> _Flow:
+        try:
+            image_bytes, cached_result, cache_key, image_signature = yield from self._lookup_flow(image)
+            if cached_result is not None:
+                return cached_result
             
-            # Aggregate results from all frames
-            aggregated_result = self._aggregate_video_analysis(frame_analyses)
-            aggregated_result["frames_analyzed"] = len(frame_analyses)
+            groups = self._shard_categories(shards)
+            shard_results = yield _Gather([self._shard_flow(image_bytes, group) for group in groups], len(groups))
             
-            return aggregated_result
+            result, invalid = self._merge_shards(shard_results)
+            return (yield _Blocking(self._finish_analysis, (result, invalid, cache_key, image_signature)))
             
         except Exception as e:
-            return {
-                "error": f"Video analysis failed: {str(e)}",
-                "overall_score": 0,
-                "summary": "Video analysis could not be completed",
-                "categories": {},
-                "priority_issues": [],
-                "strengths": []
+            return self._analysis_error(str(e))
+    
+    def analyze_image_sharded(self, image: ImageInput, shards: int = 3) -> Dict[str, Any]:
+        """Analyze an image with the categories split across concurrent requests
+
+        Output tokens are generated sequentially, so one request for all
+        checkpoints is slow. Each shard asks about a subset of the categories
+        with a proportionally smaller max_tokens, latency is bounded by the
+        slowest shard, and a failed shard is retried on its own.
+        """
+        return self._run(self._sharded_flow(image, shards))
+    
+    async def analyze_image_sharded_async(self, image: ImageInput, shards: int = 3) -> Dict[str, Any]:
+        """Async counterpart of analyze_image_sharded"""
+        return await self._run_async(self._sharded_flow(image, shards))
+    
+    def _merge_tile_analyses(self, tile_analyses: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Merge per-tile results into one page-level result
+
+        For each checkpoint the worst status reported with reasonable
+        confidence (>= 2) wins, since an issue visible in any part of the page
+        is an issue for the page; low-confidence verdicts only count if no tile
+        is more certain. Category scores are recomputed from the merged
+        verdicts and the overall score is their mean.
+        """
+        successful = [analysis for analysis in tile_analyses if 'error' not in analysis]
+        if not successful:
+            return self._analysis_error("No tiles could be analyzed")
+        
+        severity = {"PASS": 0, "NEEDS_ATTENTION": 1, "FAIL": 2}
+        categories = {}
+        for category_id, category in self.heuristics.items():
+            checkpoints = {}
+            for checkpoint in category["checkpoints"]:
+                verdicts = []
+                for analysis in successful:
+                    verdict = analysis.get("categories", {}).get(category_id, {}).get("checkpoints", {}).get(checkpoint["id"])
+                    if isinstance(verdict, dict) and verdict.get("status") in severity:
+                        verdicts.append(verdict)
+                if not verdicts:
+                    continue
+                
+                confident = [verdict for verdict in verdicts if (verdict.get("confidence") or 0) >= 2] or verdicts
+                worst = max(confident, key=lambda verdict: (severity[verdict["status"]], verdict.get("confidence") or 0))
+                checkpoints[checkpoint["id"]] = {**worst, "text": checkpoint["text"]}
+            
+            categories[category_id] = {
+                "title": category["title"],
+                "score": self._score_from_statuses(checkpoints),
+                "checkpoints": checkpoints
             }
+        
+        evaluated_scores = [category["score"] for category in categories.values() if category["checkpoints"]]
+        overall_score = round(sum(evaluated_scores) / len(evaluated_scores)) if evaluated_scores else 0
+        first_summary = successful[0].get("summary", "")
+        
+        merged = {
+            "overall_score": overall_score,
+            "summary": f"Full-page analysis across {len(successful)} viewport tiles. {first_summary}".strip(),
+            "categories": categories,
+            "priority_issues": list(dict.fromkeys(
+                issue for analysis in successful for issue in analysis.get("priority_issues", [])
+            ))[:10],
+            "strengths": list(dict.fromkeys(
+                strength for analysis in successful for strength in analysis.get("strengths", [])
+            ))[:10],
+            "tiles_analyzed": len(successful)
+        }
+        return self.merge_with_all_heuristics(merged)
     
-    def _extract_video_frames(self, video_path: str, num_frames: int) -> List[str]:
-        """Extract evenly spaced frames from video"""
-        frames = []
+    def _score_from_statuses(self, checkpoints: Dict[str, Any]) -> int:
+        """Category score from checkpoint verdicts: PASS counts fully, NEEDS_ATTENTION half"""
+        points = {"PASS": 1.0, "NEEDS_ATTENTION": 0.5, "FAIL": 0.0}
+        evaluated = [points[cp["status"]] for cp in checkpoints.values() if cp.get("status") in points]
+        return round(100 * sum(evaluated) / len(evaluated)) if evaluated else 0
+    
+    def _video_flow(self, video_path: str, num_frames: int, max_concurrency: int, batched: bool,
+                    frame_selection: str, progress: Optional[ProgressCallback]) -> _Flow:
+        report = progress or _no_progress
         try:
-            cap = cv2.VideoCapture(video_path)
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            # Extract frames from video
+            report("Extracting frames", 0.05)
+            frames = yield _Blocking(self._extract_video_frames, (video_path, num_frames, frame_selection))
             
-            if total_frames == 0:
-                return frames
+            if not frames:
+                return self._video_error("Could not extract frames from video", "Video analysis failed")
             
-            # Calculate frame indices to extract
-            frame_indices = [int(i * total_frames / num_frames) for i in range(num_frames)]
+            # Skip frames that look the same as one already selected
+            kept_frames, skipped_frames = yield _Blocking(self._drop_near_duplicate_frames, (frames,))
+            report(f"Extracted {len(kept_frames)} frames", 0.2)
             
-            for i, frame_idx in enumerate(frame_indices):
-                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-                ret, frame = cap.read()
-                
-                if ret:
-                    # Save frame as temporary image
-                    temp_file = tempfile.NamedTemporaryFile(suffix='.jpg', delete=False)
-                    cv2.imwrite(temp_file.name, frame)
-                    frames.append(temp_file.name)
+            if batched:
+                report(f"Analyzing {len(kept_frames)} frames in one request", 0.3)
+                batch_result = yield from self._batch_flow(kept_frames)
+                return self._finish_batch_video_analysis(batch_result, skipped_frames)
+            
+            done = [0]
+            done_lock = threading.Lock()
+            
+            def frame_flow(frame: bytes) -> _Flow:
+                # Checked before each frame so a cancelled job skips frames still queued
+                report(f"Analyzing frames ({done[0]}/{len(kept_frames)} done)")
+                analysis = yield from self._image_flow(frame)
+                with done_lock:
+                    done[0] += 1
+                    finished = done[0]
+                report(f"Frame {finished}/{len(kept_frames)} analyzed", 0.2 + 0.8 * finished / len(kept_frames))
+                return analysis
             
-            cap.release()
-            return frames
+            # Frames are analyzed concurrently; results come back in frame order
+            analyses = yield _Gather([frame_flow(frame) for frame in kept_frames], max_concurrency)
+            
+            return self._finish_video_analysis(analyses, skipped_frames)
             
+        except Exception as e:
+            return self._video_error(f"Video analysis failed: {str(e)}", "Video analysis could not be completed")
+    
+    def analyze_video(self, video_path: str, num_frames: int = 5,
+                      max_concurrency: int = 4, batched: bool = False,
+                      frame_selection: str = "uniform",
+                      progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """Analyze a video by extracting key frames and analyzing them
+
+        Frames are analyzed concurrently, at most max_concurrency at a time,
+        and results are kept in frame order. With batched=True all frames go
+        to the model in a single request instead. frame_selection="scene"
+        picks visually distinct key frames rather than evenly spaced ones.
+        progress, if given, is called with a message and a 0-1 fraction as
+        extraction and each frame finish; an exception it raises aborts the
+        remaining frames.
+        """
+        return self._run(self._video_flow(video_path, num_frames, max_concurrency, batched,
+                                          frame_selection, progress))
+    
+    async def analyze_video_async(self, video_path: str, num_frames: int = 5,
+                                  max_concurrency: int = 4, batched: bool = False,
+                                  frame_selection: str = "uniform",
+                                  progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """Async counterpart of analyze_video
+
+        Frame extraction runs in a worker thread; frame analyses are awaited
+        concurrently, at most max_concurrency in flight. progress is called
+        on the event loop, and an exception it raises cancels the frames
+        still in flight.
+        """
+        return await self._run_async(self._video_flow(video_path, num_frames, max_concurrency, batched,
+                                                      frame_selection, progress))
+    
+    def _finish_video_analysis(self, analyses: List[Dict[str, Any]], skipped_frames: int) -> Dict[str, Any]:
+        """Aggregate ordered frame analyses, ignoring frames that failed"""
+        frame_analyses = [analysis for analysis in analyses if 'error' not in analysis]
+        
+        if not frame_analyses:
+            return self._video_error("No frames could be analyzed", "Video analysis failed")
+        
+        # Aggregate results from all frames
+        aggregated_result = self._aggregate_video_analysis(frame_analyses)
+        aggregated_result["frames_analyzed"] = len(frame_analyses)
+        aggregated_result["frames_skipped"] = skipped_frames
+        
+        return aggregated_result
+    
+    def _finish_batch_video_analysis(self, batch_result: Dict[str, Any], skipped_frames: int) -> Dict[str, Any]:
+        """Aggregate a batched frame analysis"""
+        if 'error' in batch_result or not batch_result.get("frames"):
+            return self._video_error(batch_result.get("error", "No frames could be analyzed"), "Video analysis failed")
+        
+        aggregated_result = self._aggregate_video_analysis(batch_result)
+        aggregated_result["frames_analyzed"] = len(batch_result["frames"])
+        aggregated_result["frames_skipped"] = skipped_frames
+        
+        return aggregated_result
+    
+    def _video_error(self, error: str, summary: str) -> Dict[str, Any]:
+        return {
+            "error": error,
+            "overall_score": 0,
+            "summary": summary,
+            "categories": {},
+            "priority_issues": [],
+            "strengths": []
+        }
+    
+    def _drop_near_duplicate_frames(self, frames: List[bytes]) -> Tuple[List[bytes], int]:
+        """Remove frames that look the same as the frame kept just before them
+
+        Only consecutive frames are compared, in structure and colour, so a
+        screen that returns later in the video is analyzed again.
+        Returns the kept encoded frames and the number of frames dropped.
+        """
+        if self.frame_duplicate_threshold <= 0:
+            return frames, 0
+        
+        kept_frames = []
+        previous = None
+        for frame in frames:
+            signature = self._safe_signature(frame)
+            if (signature is not None and previous is not None
+                    and is_near_duplicate(signature, previous, self.frame_duplicate_threshold)):
+                continue
+            kept_frames.append(frame)
+            previous = signature
+        
+        skipped = len(frames) - len(kept_frames)
+        self._count("frames_skipped", skipped)
+        return kept_frames, skipped
+    
+    def _extract_video_frames(self, video_path: str, num_frames: int,
+                              frame_selection: str = "uniform") -> List[bytes]:
+        """Extract frames from video as in-memory JPEG bytes
+
+        frame_selection is "uniform" for evenly spaced frames or "scene" for up
+        to num_frames visually distinct key frames chosen by scene change.
+        Decoding runs in a worker process so long recordings don't stall the
+        app; gaps between samples are grabbed through or seeked across
+        depending on the video's keyframe interval.
+        """
+        try:
+            # OpenCV is only loaded by the video features
+            from video_frames import extract_key_frames_in_worker
+            return extract_key_frames_in_worker(
+                video_path, num_frames, frame_selection, max_width=self.max_frame_width
+            )
         except Exception as e:
             print(f"Error extracting video frames: {e}")
-            return frames
+            return []
     
-    def _aggregate_video_analysis(self, frame_analyses: List[Dict]) -> Dict[str, Any]:
-        """Aggregate analysis results from multiple video frames"""
+    def _aggregate_video_analysis(self, frame_analyses: Union[List[Dict], Dict[str, Any]]) -> Dict[str, Any]:
+        """Aggregate analysis results from multiple video frames
+
+        Accepts either a list of per-frame results or the batched shape
+        {"frames": [...], "combined": {...}} returned by analyze_images_batch.
+        """
+        if isinstance(frame_analyses, dict):
+            return self._aggregate_batch_analysis(frame_analyses)
+        
         if not frame_analyses:
             return {}
         
@@ -342,52 +1431,113 @@ Focus on practical, actionable insights that would help improve the user experie
             "strengths": unique_strengths[:10]  # Limit to top 10
         }
     
-    def analyze_website(self, url: str, screenshot_path: Optional[str] = None) -> Dict[str, Any]:
-        """Analyze a website by taking a screenshot and analyzing it"""
+    def _aggregate_batch_analysis(self, batch_result: Dict[str, Any]) -> Dict[str, Any]:
+        """Aggregate a batched response, preferring the model's combined verdicts"""
+        frames = batch_result.get("frames") or []
+        combined = batch_result.get("combined")
+        aggregated = self._aggregate_video_analysis(frames) if frames else {}
+        if not combined:
+            return aggregated
+        
+        overall_score = combined.get("overall_score", aggregated.get("overall_score", 0))
+        return {
+            "overall_score": overall_score,
+            "summary": combined.get("summary") or aggregated.get("summary", ""),
+            "categories": combined.get("categories", aggregated.get("categories", {})),
+            "priority_issues": list(dict.fromkeys(
+                combined.get("priority_issues", []) + aggregated.get("priority_issues", [])
+            ))[:10],
+            "strengths": list(dict.fromkeys(
+                combined.get("strengths", []) + aggregated.get("strengths", [])
+            ))[:10],
+            "frame_scores": [frame.get("overall_score", 0) for frame in frames]
+        }
+    
+    def _website_flow(self, url: str, screenshot_path: Optional[str], tiled: bool,
+                      progress: Optional[ProgressCallback]) -> _Flow:
+        analyze = self._tiled_flow if tiled else self._image_flow
+        report = progress or _no_progress
         try:
             if screenshot_path and os.path.exists(screenshot_path):
                 # Use provided screenshot
-                return self.analyze_image(screenshot_path)
-            else:
-                # Capture website screenshot
-                from website_capture import WebsiteCapture
-                
-                capture = WebsiteCapture()
-                screenshot_path = capture.capture_website(url)
-                
-                if screenshot_path:
-                    # Analyze the captured screenshot
-                    result = self.analyze_image(screenshot_path)
-                    
-                    # Add website-specific information
-                    result["analyzed_url"] = url
-                    result["screenshot_path"] = screenshot_path
-                    
-                    # Clean up screenshot after analysis
-                    capture.cleanup_screenshot(screenshot_path)
-                    
-                    return result
-                else:
-                    return {
-                        "error": "Failed to capture website screenshot",
-                        "analyzed_url": url,
-                        "overall_score": 0,
-                        "summary": "Website screenshot capture failed",
-                        "categories": {},
-                        "priority_issues": ["Screenshot capture failed"],
-                        "strengths": []
-                    }
-                
+                report("Analyzing screenshot", 0.4)
+                return (yield from analyze(screenshot_path))
+            
+            # Capture website screenshot
+            from website_capture import WebsiteCapture
+            
+            report(f"Capturing {url}", 0.05)
+            capture = WebsiteCapture()
+            screenshot = yield _Blocking(functools.partial(capture.capture_website_bytes, url,
+                                                           quality=self.image_quality))
+            
+            if not screenshot:
+                return self._website_capture_failed(url)
+            
+            # Analyze the captured screenshot
+            report(f"Capture done in {capture.last_timings.get('total', 0):.1f} s, analyzing", 0.4)
+            result = yield from analyze(screenshot)
+            return self._website_result(result, url, screenshot, capture.last_timings)
+            
         except Exception as e:
-            return {
-                "error": f"Website analysis failed: {str(e)}",
-                "analyzed_url": url,
-                "overall_score": 0,
-                "summary": "Website analysis could not be completed",
-                "categories": {},
-                "priority_issues": [],
-                "strengths": []
-            }
+            return self._website_error(url, e)
+    
+    def analyze_website(self, url: str, screenshot_path: Optional[str] = None,
+                        tiled: bool = False,
+                        progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """Analyze a website by taking a screenshot and analyzing it
+
+        The screenshot is captured in memory as JPEG through CDP and handed
+        straight to the analyzer, so nothing is written to disk. With
+        tiled=True the full-page screenshot is analyzed as viewport-sized
+        tiles in parallel instead of as one downscaled image. progress works
+        as in analyze_video.
+        """
+        return self._run(self._website_flow(url, screenshot_path, tiled, progress))
+    
+    async def analyze_website_async(self, url: str, screenshot_path: Optional[str] = None,
+                                    tiled: bool = False,
+                                    progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """Async counterpart of analyze_website
+
+        The blocking Selenium capture is handed off to a worker thread so the
+        event loop keeps serving other analyses while the page loads.
+        """
+        return await self._run_async(self._website_flow(url, screenshot_path, tiled, progress))
+    
+    def _website_result(self, result: Dict[str, Any], url: str, screenshot: bytes,
+                        capture_timings: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        """Add website-specific information to an analysis result"""
+        result["analyzed_url"] = url
+        # Captures live in memory only; there is no file to point at
+        result["screenshot_path"] = None
+        result["screenshot_bytes"] = len(screenshot)
+        result["screenshot_mime_type"] = detect_mime_type(screenshot)
+        if capture_timings:
+            result["capture_timings"] = capture_timings
+        return result
+    
+    def _website_capture_failed(self, url: str) -> Dict[str, Any]:
+        return {
+            "error": "Failed to capture website screenshot",
+            "analyzed_url": url,
+            "overall_score": 0,
+            "summary": "Website screenshot capture failed",
+            "categories": {},
+            "priority_issues": ["Screenshot capture failed"],
+            "strengths": []
+        }
+    
+    def _website_error(self, url: str, error: Exception) -> Dict[str, Any]:
+        return {
+            "error": f"Website analysis failed: {str(error)}",
+            "analyzed_url": url,
+            "overall_score": 0,
+            "summary": "Website analysis could not be completed",
+            "categories": {},
+            "priority_issues": [],
+            "strengths": []
+        }
 
 # Test function
 def test_analyzer():
@@ -399,6 +1549,12 @@ def test_analyzer():
     total_checkpoints = sum(len(cat['checkpoints']) for cat in analyzer.heuristics.values())
     print(f"Total checkpoints: {total_checkpoints}")
     
+    print(f"Prompt tokens per profile: {analyzer.prompt_token_counts()}")
+    
+    if analyzer.cache:
+        print(f"Result cache: {analyzer.cache.stats()}")
+    print(f"Model calls avoided: {analyzer.calls_avoided()}")
+    
     return analyzer
 
 if __name__ == "__main__":
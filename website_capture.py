@@ -3,134 +3,552 @@ Website Screenshot Capture Module
 Captures screenshots of websites for UX analysis
 """
 
+import base64
 import os
 import tempfile
 import time
-from typing import Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException
-from webdriver_manager.chrome import ChromeDriverManager
+from driver_pool import DriverPool, drain_network_log, get_shared_pool
 
-class WebsiteCapture:
-    def __init__(self):
-        """Initialize the website capture with Chrome driver"""
-        self.driver = None
-        
-    def _setup_driver(self, mobile: bool = False) -> webdriver.Chrome:
-        """Setup Chrome driver with appropriate options"""
-        chrome_options = Options()
-        chrome_options.add_argument('--headless')
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--disable-gpu')
-        chrome_options.add_argument('--disable-extensions')
-        chrome_options.add_argument('--disable-plugins')
-        
-        if mobile:
-            # Mobile viewport
-            chrome_options.add_argument('--window-size=375,812')
-            mobile_emulation = {
-                "deviceMetrics": {"width": 375, "height": 812, "pixelRatio": 3.0},
-                "userAgent": "Mozilla/5.0 (iPhone; CPU iPhone OS 14_0 like Mac OS X) AppleWebKit/605.1.15"
-            }
-            chrome_options.add_experimental_option("mobileEmulation", mobile_emulation)
+# Device profiles for viewport emulation; width/height are CSS pixels
+DEVICE_PROFILES: Dict[str, Dict[str, Any]] = {
+    "desktop": {"width": 1920, "height": 1080, "pixel_ratio": 1.0, "mobile": False, "touch": False,
+                "user_agent": None},
+    "laptop": {"width": 1366, "height": 768, "pixel_ratio": 1.0, "mobile": False, "touch": False,
+               "user_agent": None},
+    "tablet": {"width": 768, "height": 1024, "pixel_ratio": 2.0, "mobile": True, "touch": True,
+               "user_agent": "Mozilla/5.0 (iPad; CPU OS 14_0 like Mac OS X) AppleWebKit/605.1.15"},
+    "mobile": {"width": 375, "height": 812, "pixel_ratio": 3.0, "mobile": True, "touch": True,
+               "user_agent": "Mozilla/5.0 (iPhone; CPU iPhone OS 14_0 like Mac OS X) AppleWebKit/605.1.15"},
+    "mobile_large": {"width": 414, "height": 896, "pixel_ratio": 2.0, "mobile": True, "touch": True,
+                     "user_agent": "Mozilla/5.0 (iPhone; CPU iPhone OS 14_0 like Mac OS X) AppleWebKit/605.1.15"},
+    "android": {"width": 360, "height": 800, "pixel_ratio": 3.0, "mobile": True, "touch": True,
+                "user_agent": "Mozilla/5.0 (Linux; Android 11; Pixel 5) AppleWebKit/537.36 Mobile Safari/537.36"},
+}
+
+# Network.setBlockedURLs matches URL patterns only, so resource types are
+# blocked through the file extensions and hosts that serve them
+RESOURCE_TYPE_PATTERNS: Dict[str, List[str]] = {
+    "media": ["*.mp4", "*.webm", "*.ogg", "*.mov", "*.m3u8", "*.mpd", "*.mp3", "*.wav"],
+    "font": ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"],
+    "image": ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico"],
+    "ads": ["*doubleclick.net*", "*googlesyndication.com*", "*adservice.google.*", "*amazon-adsystem.com*",
+            "*adnxs.com*", "*taboola.com*", "*outbrain.com*", "*criteo.com*"],
+    "analytics": ["*google-analytics.com*", "*googletagmanager.com*", "*segment.io*", "*segment.com/analytics*",
+                  "*hotjar.com*", "*mixpanel.com*", "*fullstory.com*", "*clarity.ms*", "*connect.facebook.net*",
+                  "*bat.bing.com*"],
+    "chat": ["*intercom.io*", "*intercomcdn.com*", "*drift.com*", "*zdassets.com*", "*crisp.chat*",
+             "*tawk.to*", "*livechatinc.com*"],
+}
+# Blocked by default: third parties that slow the load and never belong in a UX screenshot
+DEFAULT_BLOCKED_RESOURCE_TYPES = ("media", "ads", "analytics", "chat")
+
+
+def blocked_url_patterns(resource_types: Iterable[str] = DEFAULT_BLOCKED_RESOURCE_TYPES,
+                         url_patterns: Iterable[str] = ()) -> List[str]:
+    """Expand resource types into URL patterns and add any extra patterns"""
+    patterns: List[str] = []
+    for resource_type in resource_types:
+        if resource_type not in RESOURCE_TYPE_PATTERNS:
+            raise ValueError(f"Unknown resource type: {resource_type}")
+        patterns.extend(RESOURCE_TYPE_PATTERNS[resource_type])
+    patterns.extend(url_patterns)
+    return list(dict.fromkeys(patterns))
+
+
+_PAGE_STATE_SCRIPT = """
+if (!window.__uxMutationObserver) {
+    window.__uxLastMutation = performance.now();
+    window.__uxMutationObserver = new MutationObserver(function () {
+        window.__uxLastMutation = performance.now();
+    });
+    window.__uxMutationObserver.observe(document, {
+        subtree: true, childList: true, attributes: true, characterData: true
+    });
+}
+return {
+    readyState: document.readyState,
+    sinceMutation: performance.now() - window.__uxLastMutation,
+    fontsLoaded: !document.fonts || document.fonts.status === "loaded",
+    imagesLoaded: Array.from(document.images).every(function (img) { return img.complete; })
+};
+"""
+
+# Scrolls down one viewport at a time, yielding a frame and step_delay ms
+# after each step so IntersectionObservers and scroll handlers get to run
+# and start their loads, then returns to the top. Resolves with the steps taken.
+_LAZY_LOAD_SCROLL_SCRIPT = """
+var stepDelay = arguments[0], maxSteps = arguments[1], done = arguments[arguments.length - 1];
+var steps = 0, stuck = false;
+function pageHeight() {
+    return Math.max(document.documentElement.scrollHeight, document.body ? document.body.scrollHeight : 0);
+}
+function next() {
+    var before = window.scrollY;
+    if (stuck || steps >= maxSteps || before + window.innerHeight >= pageHeight()) {
+        window.scrollTo(0, 0);
+        requestAnimationFrame(function () { done(steps); });
+        return;
+    }
+    window.scrollBy(0, window.innerHeight);
+    steps += 1;
+    // The window may not scroll at all, e.g. when the page scrolls an inner element
+    stuck = window.scrollY === before;
+    requestAnimationFrame(function () { setTimeout(next, stepDelay); });
+}
+next();
+"""
+
+
+def scroll_for_lazy_load(driver, step_delay: float = 0.1, max_steps: int = 30) -> int:
+    """
+    Scroll through the page in viewport-sized steps, then back to the top
+
+    Lazy loaders only react to scroll positions that get rendered, so a
+    jump to the bottom and straight back in one script triggers nothing.
+
+    Args:
+        step_delay: Seconds to wait after the frame that follows each step
+        max_steps: Upper bound for very long or infinitely scrolling pages
+
+    Returns:
+        Number of steps scrolled
+    """
+    driver.set_script_timeout(max(30.0, max_steps * (step_delay + 0.5)))
+    return driver.execute_async_script(_LAZY_LOAD_SCROLL_SCRIPT, int(step_delay * 1000), max_steps) or 0
+
+
+def wait_for_page_ready(driver, max_wait: float = 15.0, quiet_period: float = 0.5,
+                        max_idle_connections: int = 2, poll_interval: float = 0.1,
+                        origins: Optional[Set[str]] = None) -> Dict[str, float]:
+    """
+    Wait until the page is stable rather than sleeping a fixed time
+
+    The page counts as ready once document.readyState is "complete", no more
+    than max_idle_connections requests have been in flight for quiet_period
+    (long-polling and analytics beacons may never finish), the DOM hasn't
+    mutated for quiet_period, and web fonts and images have loaded, all at
+    the same time. Gives up after max_wait seconds. Origins of requests seen while waiting are added
+    to origins, if given.
+
+    Returns:
+        Seconds until each condition was first met (it may have lapsed
+        again before the page was ready), the total wait, and
+        timed_out (1.0 if max_wait was hit)
+    """
+    start = time.perf_counter()
+    timings: Dict[str, float] = {}
+    in_flight: Set[str] = set()
+    has_network_log = True
+    network_idle_since = None
+
+    while True:
+        now = time.perf_counter()
+        elapsed = now - start
+        if has_network_log:
+            has_network_log = drain_network_log(driver, in_flight, origins)
+
+        try:
+            state = driver.execute_script(_PAGE_STATE_SCRIPT)
+        except Exception:
+            # The document may be mid-navigation; try again on the next poll
+            state = None
+
+        if has_network_log and len(in_flight) > max_idle_connections:
+            network_idle_since = None
         else:
-            # Desktop viewport
-            chrome_options.add_argument('--window-size=1920,1080')
+            network_idle_since = network_idle_since or now
+
+        if state:
+            conditions = {
+                "ready_state": state["readyState"] == "complete",
+                "network_idle": now - network_idle_since >= quiet_period if network_idle_since else False,
+                "dom_quiet": state["sinceMutation"] >= quiet_period * 1000,
+                "resources_loaded": bool(state["fontsLoaded"] and state["imagesLoaded"]),
+            }
+            for name, met in conditions.items():
+                if met:
+                    timings.setdefault(name, elapsed)
+
+            # A condition met earlier can stop holding (new requests, mutations or
+            # injected images), so all of them must hold in the same poll
+            if all(conditions.values()):
+                timings["total"] = elapsed
+                timings["timed_out"] = 0.0
+                return timings
+
+        if elapsed >= max_wait:
+            timings["total"] = elapsed
+            timings["timed_out"] = 1.0
+            return timings
+        time.sleep(poll_interval)
+
+
+def capture_screenshot_bytes(driver: webdriver.Chrome, image_format: str = "jpeg", quality: int = 80,
+                             clip: Optional[Dict[str, float]] = None) -> bytes:
+    """
+    Take a full-page screenshot with CDP Page.captureScreenshot
+    
+    Args:
+        driver: Chrome driver with the page loaded
+        image_format: "jpeg", "webp" or "png"
+        quality: Compression quality (0-100), ignored for png
+        clip: Region with x, y, width and height in CSS pixels; defaults to the
+            whole scrollable page
         
-        try:
-            # Use webdriver-manager to automatically manage ChromeDriver
-            service = Service(ChromeDriverManager().install())
-            driver = webdriver.Chrome(service=service, options=chrome_options)
-            return driver
-        except Exception as e:
-            raise Exception(f"Failed to setup Chrome driver: {str(e)}")
+    Returns:
+        Encoded image bytes
+    """
+    if clip is None:
+        metrics = driver.execute_cdp_cmd("Page.getLayoutMetrics", {})
+        content = metrics.get("cssContentSize") or metrics["contentSize"]
+        clip = {"x": 0, "y": 0, "width": content["width"], "height": content["height"]}
     
-    def capture_website(self, url: str, mobile: bool = False, wait_time: int = 5) -> Optional[str]:
+    params: Dict[str, Any] = {
+        "format": image_format,
+        "captureBeyondViewport": True,
+        "fromSurface": True,
+        "clip": {"scale": 1, **clip},
+    }
+    if image_format != "png":
+        params["quality"] = quality
+    result = driver.execute_cdp_cmd("Page.captureScreenshot", params)
+    return base64.b64decode(result["data"])
+
+
+class WebsiteCapture:
+    def __init__(self, pool: Optional[DriverPool] = None,
+                 block_resource_types: Iterable[str] = DEFAULT_BLOCKED_RESOURCE_TYPES,
+                 block_url_patterns: Iterable[str] = ()):
+        """Initialize the website capture
+
+        Captures borrow warm browsers from pool, or from the process-wide
+        shared pool if none is given. Requests matching the blocked resource
+        types (keys of RESOURCE_TYPE_PATTERNS) or URL patterns (* wildcards)
+        fail immediately instead of loading.
         """
-        Capture a screenshot of a website
+        self.driver = None
+        self.pool = pool or get_shared_pool()
+        self.blocked_patterns = blocked_url_patterns(block_resource_types, block_url_patterns)
+        # Per-phase timing of the most recent capture, in seconds
+        self.last_timings: Dict[str, float] = {}
         
-        Args:
-            url: Website URL to capture
-            mobile: Whether to capture mobile view
-            wait_time: Time to wait for page load
-            
-        Returns:
-            Path to the captured screenshot file, or None if failed
-        """
-        try:
-            # Validate URL
-            if not url.startswith(('http://', 'https://')):
-                url = 'https://' + url
-            
-            # Setup driver
-            self.driver = self._setup_driver(mobile=mobile)
-            
-            # Navigate to URL
-            print(f"Navigating to: {url}")
-            self.driver.get(url)
-            
-            # Wait for page to load
+    def _resolve_profile(self, profile: Union[str, Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+        """Look up a named device profile, or accept a custom profile dict"""
+        if isinstance(profile, str):
+            return profile, DEVICE_PROFILES[profile]
+        return profile.get("name", f"{profile['width']}x{profile['height']}"), profile
+    
+    def _apply_profile(self, driver: webdriver.Chrome, profile: Dict[str, Any], height: Optional[int] = None):
+        """Emulate a device on a pooled browser via CDP device-metrics emulation"""
+        driver.execute_cdp_cmd("Emulation.setDeviceMetricsOverride", {
+            "width": profile["width"],
+            "height": height or profile["height"],
+            "deviceScaleFactor": profile.get("pixel_ratio", 1.0),
+            "mobile": profile.get("mobile", False),
+        })
+        # Profiles without a user agent restore the browser default, so a
+        # desktop capture after a mobile one in the same session is not mobile
+        user_agent = profile.get("user_agent") or self.pool.default_user_agent(driver)
+        driver.execute_cdp_cmd("Emulation.setUserAgentOverride", {"userAgent": user_agent})
+        driver.execute_cdp_cmd("Emulation.setTouchEmulationEnabled", {"enabled": profile.get("touch", False)})
+    
+    def _load_page(self, driver: webdriver.Chrome, url: str, profile: Dict[str, Any],
+                   timings: Dict[str, float], wait_time: int = 5, wait_strategy: str = "ready",
+                   max_wait: float = 15.0):
+        """Navigate to url in an emulated device and wait for the page to load"""
+        self._apply_profile(driver, profile)
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": self.blocked_patterns})
+        # Skip network events left over from the previous capture, keeping their origins for the reset
+        origins = self.pool.seen_origins(driver)
+        drain_network_log(driver, set(), origins)
+        
+        # Navigate to URL
+        print(f"Navigating to: {url}")
+        phase_start = time.perf_counter()
+        driver.get(url)
+        timings["navigate"] = time.perf_counter() - phase_start
+        
+        # Wait for page to load
+        phase_start = time.perf_counter()
+        if wait_strategy == "fixed":
             time.sleep(wait_time)
             
             # Wait for body element to be present
             try:
-                WebDriverWait(self.driver, 10).until(
+                WebDriverWait(driver, 10).until(
                     EC.presence_of_element_located((By.TAG_NAME, "body"))
                 )
             except TimeoutException:
                 print("Warning: Page may not have loaded completely")
-            
-            # Get page dimensions and scroll to capture full page
-            total_height = self.driver.execute_script("return document.body.scrollHeight")
-            viewport_height = self.driver.execute_script("return window.innerHeight")
-            
-            # Set window size to capture full page
-            self.driver.set_window_size(1920 if not mobile else 375, total_height)
+        else:
+            readiness = wait_for_page_ready(driver, max_wait=max_wait, origins=origins)
+            timings.update({f"ready_{key}": value for key, value in readiness.items()})
+            if readiness["timed_out"]:
+                print("Warning: Page may not have loaded completely")
+        timings["wait_for_load"] = time.perf_counter() - phase_start
+    
+    def _capture_with_driver(self, driver: webdriver.Chrome, url: str, profile: Dict[str, Any],
+                             timings: Dict[str, float], wait_time: int = 5, wait_strategy: str = "ready",
+                             max_wait: float = 15.0) -> Optional[str]:
+        """Load url in an emulated device on driver and save a full-page screenshot"""
+        self._load_page(driver, url, profile, timings, wait_time, wait_strategy, max_wait)
+        
+        # Get page dimensions to capture full page
+        total_height = driver.execute_script("return document.body.scrollHeight")
+        
+        # Grow the emulated viewport to the full page height
+        phase_start = time.perf_counter()
+        self._apply_profile(driver, profile, height=total_height)
+        if wait_strategy == "fixed":
             time.sleep(2)  # Allow time for resize
+        else:
+            # Lazy-loaded content below the fold starts loading after the resize
+            wait_for_page_ready(driver, max_wait=min(3.0, max_wait), quiet_period=0.3,
+                                origins=self.pool.seen_origins(driver))
+        timings["resize"] = time.perf_counter() - phase_start
+        
+        # Create temporary file for screenshot
+        temp_file = tempfile.NamedTemporaryFile(suffix='.png', delete=False)
+        screenshot_path = temp_file.name
+        temp_file.close()
+        
+        # Capture screenshot
+        phase_start = time.perf_counter()
+        success = driver.save_screenshot(screenshot_path)
+        timings["screenshot"] = time.perf_counter() - phase_start
+        
+        if success and os.path.exists(screenshot_path):
+            print(f"Screenshot saved: {screenshot_path}")
+            return screenshot_path
+        print("Failed to save screenshot")
+        self.cleanup_screenshot(screenshot_path)
+        return None
+    
+    def _capture_bytes_with_driver(self, driver: webdriver.Chrome, url: str, profile: Dict[str, Any],
+                                   timings: Dict[str, float], image_format: str = "jpeg", quality: int = 80,
+                                   clip: Optional[Dict[str, float]] = None, wait_time: int = 5,
+                                   wait_strategy: str = "ready", max_wait: float = 15.0) -> Optional[bytes]:
+        """Load url in an emulated device on driver and return a full-page screenshot via CDP"""
+        self._load_page(driver, url, profile, timings, wait_time, wait_strategy, max_wait)
+        
+        # Scroll through once so lazy-loaded content below the fold is fetched,
+        # without the relayout that growing the viewport would cause
+        phase_start = time.perf_counter()
+        try:
+            timings["lazy_load_steps"] = float(scroll_for_lazy_load(driver))
+        except TimeoutException:
+            print("Warning: Scrolling for lazy-loaded content timed out")
+        if wait_strategy != "fixed":
+            wait_for_page_ready(driver, max_wait=min(3.0, max_wait), quiet_period=0.3,
+                                origins=self.pool.seen_origins(driver))
+        timings["lazy_load"] = time.perf_counter() - phase_start
+        
+        phase_start = time.perf_counter()
+        data = capture_screenshot_bytes(driver, image_format=image_format, quality=quality, clip=clip)
+        timings["screenshot"] = time.perf_counter() - phase_start
+        
+        if not data:
+            print("Failed to capture screenshot")
+            return None
+        print(f"Screenshot captured in memory: {len(data)} bytes ({image_format})")
+        return data
+    
+    def _normalize_url(self, url: str) -> str:
+        # Validate URL
+        if not url.startswith(('http://', 'https://')):
+            url = 'https://' + url
+        return url
+    
+    def _capture_profile(self, url: str, profile: Union[str, Dict[str, Any]], wait_time: int = 5,
+                         wait_strategy: str = "ready", max_wait: float = 15.0,
+                         image_format: Optional[str] = None, quality: int = 80,
+                         clip: Optional[Dict[str, float]] = None) -> Tuple[Optional[Union[str, bytes]], Dict[str, float]]:
+        """Capture one device profile on its own pooled browser
+        
+        Returns a PNG file path, or the encoded image bytes when image_format is given.
+        """
+        capture_start = time.perf_counter()
+        timings: Dict[str, float] = {}
+        driver = None
+        broken = False
+        try:
+            _, profile = self._resolve_profile(profile)
             
-            # Create temporary file for screenshot
-            temp_file = tempfile.NamedTemporaryFile(suffix='.png', delete=False)
-            screenshot_path = temp_file.name
-            temp_file.close()
-            
-            # Capture screenshot
-            success = self.driver.save_screenshot(screenshot_path)
+            # Borrow a warm driver from the pool
+            phase_start = time.perf_counter()
+            driver = self.pool.acquire()
+            timings["acquire_driver"] = time.perf_counter() - phase_start
             
-            if success and os.path.exists(screenshot_path):
-                print(f"Screenshot saved: {screenshot_path}")
-                return screenshot_path
-            else:
-                print("Failed to save screenshot")
-                return None
+            if image_format:
+                return self._capture_bytes_with_driver(
+                    driver, self._normalize_url(url), profile, timings, image_format, quality, clip,
+                    wait_time, wait_strategy, max_wait
+                ), timings
+            return self._capture_with_driver(
+                driver, self._normalize_url(url), profile, timings, wait_time, wait_strategy, max_wait
+            ), timings
                 
         except WebDriverException as e:
+            # Recycle the browser rather than return a possibly crashed one to the pool
+            broken = True
             print(f"WebDriver error: {str(e)}")
-            return None
+            return None, timings
         except Exception as e:
             print(f"Error capturing website: {str(e)}")
-            return None
+            return None, timings
+        finally:
+            if driver:
+                self.pool.release(driver, broken=broken)
+            timings["total"] = time.perf_counter() - capture_start
+    
+    def capture_website(self, url: str, mobile: bool = False, wait_time: int = 5,
+                        wait_strategy: str = "ready", max_wait: float = 15.0) -> Optional[str]:
+        """
+        Capture a screenshot of a website
+        
+        Args:
+            url: Website URL to capture
+            mobile: Whether to capture mobile view
+            wait_time: Time to wait for page load with the "fixed" strategy
+            wait_strategy: "ready" to finish as soon as the page is stable, or "fixed" to sleep wait_time
+            max_wait: Upper bound on the readiness wait
+            
+        Returns:
+            Path to the captured screenshot file, or None if failed. The
+            timing breakdown is available in last_timings.
+        """
+        screenshot_path, self.last_timings = self._capture_profile(
+            url, "mobile" if mobile else "desktop", wait_time, wait_strategy, max_wait
+        )
+        return screenshot_path
+    
+    def capture_website_bytes(self, url: str, mobile: bool = False, image_format: str = "jpeg",
+                              quality: int = 80, clip: Optional[Dict[str, float]] = None,
+                              wait_strategy: str = "ready", max_wait: float = 15.0) -> Optional[bytes]:
+        """
+        Capture a full-page screenshot in memory using CDP Page.captureScreenshot
+        
+        The page is rendered beyond the viewport instead of resizing the window,
+        so sticky headers and 100vh sections keep their real layout, and the
+        result is compressed in the browser and never written to disk.
+        
+        Args:
+            url: Website URL to capture
+            mobile: Whether to capture mobile view
+            image_format: "jpeg", "webp" or "png"
+            quality: Compression quality (0-100) for jpeg and webp
+            clip: Optional region with x, y, width and height in CSS pixels;
+                defaults to the full page
+            wait_strategy: "ready" or "fixed", as for capture_website
+            max_wait: Upper bound on the readiness wait
+            
+        Returns:
+            Encoded image bytes, or None if failed. The timing breakdown is
+            available in last_timings.
+        """
+        data, self.last_timings = self._capture_profile(
+            url, "mobile" if mobile else "desktop", wait_strategy=wait_strategy, max_wait=max_wait,
+            image_format=image_format, quality=quality, clip=clip
+        )
+        return data
+    
+    def capture_matrix(self, url: str, profiles: Optional[List[Union[str, Dict[str, Any]]]] = None,
+                       parallel: bool = False, wait_strategy: str = "ready", max_wait: float = 15.0,
+                       image_format: Optional[str] = None,
+                       quality: int = 80) -> Iterator[Tuple[str, Optional[Union[str, bytes]], Dict[str, float]]]:
+        """
+        Capture a page across several device profiles, yielding each as it completes
+        
+        Args:
+            url: Website URL to capture
+            profiles: Names from DEVICE_PROFILES or custom dicts with width,
+                height, pixel_ratio, user_agent, mobile and touch keys
+                (defaults to every built-in profile)
+            parallel: Capture profiles concurrently on separate pooled browsers
+                instead of one after another in a single browser session
+            wait_strategy: "ready" or "fixed", as for capture_website
+            max_wait: Upper bound on each readiness wait
+            image_format: Capture in memory via CDP in this format ("jpeg",
+                "webp" or "png") instead of saving PNG files
+            quality: Compression quality for jpeg and webp
+            
+        Yields:
+            (profile_name, screenshot path or bytes or None, timings) tuples
+        """
+        profiles = profiles or list(DEVICE_PROFILES)
+        url = self._normalize_url(url)
+        
+        if parallel:
+            workers = max(1, min(len(profiles), self.pool.size))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(self._capture_profile, url, profile, 5, wait_strategy, max_wait,
+                                    image_format, quality):
+                        self._resolve_profile(profile)[0]
+                    for profile in profiles
+                }
+                for future in as_completed(futures):
+                    screenshot_path, timings = future.result()
+                    yield futures[future], screenshot_path, timings
+            return
+        
+        # One browser session: switch device emulation between captures, so
+        # later profiles reuse the connection and HTTP cache of the first
+        driver = self.pool.acquire()
+        broken = False
+        try:
+            for profile in profiles:
+                name, profile = self._resolve_profile(profile)
+                capture_start = time.perf_counter()
+                timings: Dict[str, float] = {}
+                try:
+                    if image_format:
+                        screenshot = self._capture_bytes_with_driver(
+                            driver, url, profile, timings, image_format, quality,
+                            wait_strategy=wait_strategy, max_wait=max_wait
+                        )
+                    else:
+                        screenshot = self._capture_with_driver(
+                            driver, url, profile, timings, wait_strategy=wait_strategy, max_wait=max_wait
+                        )
+                except WebDriverException as e:
+                    broken = True
+                    print(f"WebDriver error: {str(e)}")
+                    screenshot = None
+                except Exception as e:
+                    # As in _capture_profile: this profile failed, the rest still run
+                    print(f"Error capturing website: {str(e)}")
+                    screenshot = None
+                timings["total"] = time.perf_counter() - capture_start
+                yield name, screenshot, timings
+                if broken:
+                    # Continue the remaining profiles on a fresh browser
+                    self.pool.release(driver, broken=True)
+                    driver = None
+                    driver = self.pool.acquire()
+                    broken = False
         finally:
-            if self.driver:
-                self.driver.quit()
-                self.driver = None
+            if driver:
+                self.pool.release(driver, broken=broken)
     
     def capture_both_views(self, url: str) -> Tuple[Optional[str], Optional[str]]:
         """
-        Capture both desktop and mobile views of a website
+        Capture both desktop and mobile views of a website in parallel
         
         Returns:
             Tuple of (desktop_screenshot_path, mobile_screenshot_path)
         """
-        desktop_path = self.capture_website(url, mobile=False)
-        mobile_path = self.capture_website(url, mobile=True)
+        paths = {name: path for name, path, _ in self.capture_matrix(url, ["desktop", "mobile"], parallel=True)}
         
-        return desktop_path, mobile_path
+        return paths.get("desktop"), paths.get("mobile")
     
     def cleanup_screenshot(self, screenshot_path: str):
         """Clean up temporary screenshot file"""
@@ -154,13 +572,168 @@ def test_capture():
     if screenshot_path:
         print(f"✅ Screenshot captured successfully: {screenshot_path}")
         print(f"File size: {os.path.getsize(screenshot_path)} bytes")
+        print(f"Timings: {capture.last_timings}")
         
         # Clean up
         capture.cleanup_screenshot(screenshot_path)
         print("✅ Cleanup completed")
     else:
         print("❌ Screenshot capture failed")
+    
+    # In-memory CDP capture
+    screenshot = capture.capture_website_bytes(test_url, image_format="jpeg", quality=80)
+    if screenshot:
+        print(f"✅ In-memory JPEG capture: {len(screenshot)} bytes in {capture.last_timings['total']:.2f} s")
+    else:
+        print("❌ In-memory capture failed")
+    
+    # One browser session across several viewports
+    for profile_name, path, timings in capture.capture_matrix(test_url, ["desktop", "tablet", "mobile"]):
+        print(f"{profile_name}: {'ok' if path else 'failed'} in {timings.get('total', 0):.2f} s")
+        if path:
+            capture.cleanup_screenshot(path)
+    
+    print(f"Driver pool: {capture.pool.stats()}")
+    capture.pool.close()
+
+# Local fixture site for the blocking test and benchmark: path -> (delay seconds, content type, body).
+# Slow third-party style assets live under /ads, /tracking and .mp4, cacheable first-party ones under /static
+_BLOCKING_FIXTURE: Dict[str, Tuple[float, str, bytes]] = {
+    "/": (0.0, "text/html", b"""<html><head><link rel="stylesheet" href="/static/app.css">
+        <script src="/ads/banner.js"></script><script src="/tracking/collect.js"></script></head>
+        <body><h1>Fixture page</h1><img src="/static/logo.png"><img src="/tracking/pixel.gif">
+        <video src="/video/intro.mp4" autoplay muted></video><p>Content</p></body></html>"""),
+    "/static/app.css": (0.5, "text/css", b"body { font-family: sans-serif; } h1 { color: #333; }"),
+    "/static/logo.png": (0.5, "image/png", base64.b64decode(
+        "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==")),
+    "/ads/banner.js": (1.0, "application/javascript", b"document.body && document.body.append('ad');"),
+    "/tracking/collect.js": (1.0, "application/javascript", b"void 0;"),
+    "/tracking/pixel.gif": (1.0, "image/gif", b"GIF89a"),
+    "/video/intro.mp4": (1.5, "video/mp4", b"\x00" * 1024),
+}
+# The fixture's ads and tracking are served locally, so the default host patterns don't match them
+_BLOCKING_FIXTURE_PATTERNS = ["*/ads/*", "*/tracking/*"]
+
+
+def _serve_blocking_fixture():
+    """Serve _BLOCKING_FIXTURE on a local port; returns the server, its URL and request counts per path"""
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    
+    served: Dict[str, int] = {}
+    
+    class FixtureHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            delay, content_type, body = _BLOCKING_FIXTURE.get(self.path, (0.0, "text/plain", b""))
+            served[self.path] = served.get(self.path, 0) + 1
+            time.sleep(delay)
+            self.send_response(200 if self.path in _BLOCKING_FIXTURE else 404)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            if self.path.startswith("/static/"):
+                self.send_header("Cache-Control", "public, max-age=3600")
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, *args):
+            pass
+    
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/", served
+
+
+def test_blocking():
+    """Capture the local fixture site with and without blocking and check blocked URLs are never fetched"""
+    blocked_paths = ["/ads/banner.js", "/tracking/collect.js", "/tracking/pixel.gif", "/video/intro.mp4"]
+    server, url, served = _serve_blocking_fixture()
+    try:
+        for label, capture_options in (("unblocked", {"block_resource_types": ()}),
+                                       ("blocked", {"block_url_patterns": _BLOCKING_FIXTURE_PATTERNS})):
+            # A fresh browser per capture, so nothing is served from the first capture's cache
+            pool = DriverPool(size=1)
+            served.clear()
+            try:
+                screenshot = WebsiteCapture(pool=pool, **capture_options).capture_website_bytes(url)
+            finally:
+                pool.close()
+            assert screenshot, f"{label} capture failed"
+            assert served.get("/static/app.css"), f"{label} capture skipped first-party assets: {served}"
+            fetched = [path for path in blocked_paths if served.get(path)]
+            if label == "unblocked":
+                # Otherwise the blocked run below would pass without blocking anything
+                assert fetched == blocked_paths, f"fixture page did not request {set(blocked_paths) - set(fetched)}"
+            else:
+                assert not fetched, f"blocked URLs were fetched: {fetched}"
+            print(f"✅ {label}: fetched {sorted(served)}")
+    finally:
+        server.shutdown()
+
+# Benchmark function
+def benchmark_blocking(repeats: int = 3):
+    """Measure load-time savings from request blocking and a persistent cache on a local fixture site"""
+    import shutil
+    
+    server, url, served = _serve_blocking_fixture()
+    profile_dir = tempfile.mkdtemp(prefix="ux_browser_profile_")
+    local_patterns = _BLOCKING_FIXTURE_PATTERNS
+    
+    def first_capture(label: str, profile_dir: Optional[str] = None, warm_profile: bool = False,
+                      **capture_options) -> Optional[float]:
+        """Best time of the first capture in a freshly launched browser, excluding Chrome startup
+
+        Each repeat gets a new pool, so nothing is cached in memory from an
+        earlier capture; with warm_profile the profile directory is first
+        filled by a capture in another pool that has since quit.
+        """
+        loads = []
+        static_hits = []
+        for _ in range(repeats):
+            if warm_profile:
+                warm_pool = DriverPool(size=1, profile_dir=profile_dir)
+                WebsiteCapture(pool=warm_pool, **capture_options).capture_website_bytes(url)
+                # Quitting Chrome flushes its disk cache into the profile
+                warm_pool.close()
+            pool = DriverPool(size=1, profile_dir=profile_dir)
+            capture = WebsiteCapture(pool=pool, **capture_options)
+            served.clear()
+            try:
+                screenshot = capture.capture_website_bytes(url)
+            finally:
+                pool.close()
+            if not screenshot:
+                print(f"{label}: capture failed")
+                return None
+            timings = capture.last_timings
+            loads.append(timings.get("total", 0.0) - timings.get("acquire_driver", 0.0))
+            static_hits.append(sum(count for path, count in served.items() if path.startswith("/static/")))
+        print(f"{label:<36} best {min(loads):5.2f} s  worst {max(loads):5.2f} s  "
+              f"static requests: {max(static_hits)}")
+        return min(loads)
+    
+    cold_profile_dir = tempfile.mkdtemp(prefix="ux_browser_profile_")
+    try:
+        baseline = first_capture("No blocking", block_resource_types=())
+        blocked = first_capture("Blocking media/ads/tracking", block_url_patterns=local_patterns)
+        cold = first_capture("Blocking, empty profile dir", profile_dir=cold_profile_dir,
+                             block_url_patterns=local_patterns)
+        cached = first_capture("Blocking, pre-warmed profile dir", profile_dir=profile_dir, warm_profile=True,
+                               block_url_patterns=local_patterns)
+        if baseline and blocked:
+            print(f"Blocking saves {baseline - blocked:.2f} s on a first capture")
+        if cold and cached:
+            print(f"A pre-warmed profile dir saves {cold - cached:.2f} s over an empty one")
+    finally:
+        server.shutdown()
+        shutil.rmtree(profile_dir, ignore_errors=True)
+        shutil.rmtree(cold_profile_dir, ignore_errors=True)
 
 if __name__ == "__main__":
-    test_capture()
+    import sys
+    if "--benchmark" in sys.argv:
+        benchmark_blocking()
+    elif "--test" in sys.argv:
+        test_blocking()
+    else:
+        test_capture()
 